@@ -1,17 +1,208 @@
+import argparse
+from array import array
+import asyncio
+import cProfile
 import csv
+from bisect import bisect_left, insort
+from contextlib import contextmanager, nullcontext
+import io
+import json
+from itertools import islice, repeat
+from operator import itemgetter
 import os
-import tkinter as tk
-from tkinter import ttk, messagebox
+import pstats
+import re
+import sqlite3
+import sys
+import threading
+import time
 import random
-from tkcalendar import Calendar  
-from datetime import datetime
+import math
+import shlex
+from datetime import date, datetime
+from functools import lru_cache, partial, wraps
+try:
+    import tkinter as tk
+    from tkinter import ttk, messagebox
+except ImportError:
+    # Python builds without Tk can still run the room commands and the companion scripts
+    tk = ttk = messagebox = None
+try:
+    import fcntl
+except ImportError:
+    # Windows has no fcntl; FileLock falls back to msvcrt
+    fcntl = None
+    import msvcrt
+
+DATE_FORMAT = "%d/%m/%Y"
+# Longest stay that can be booked or searched for; bounds the nights a booking
+# or a dated availability query has to visit in the NightIndex
+MAX_STAY_NIGHTS = 366
+
+
+@lru_cache(maxsize=4096)
+def parse_day(text):
+    """Parse a DD/MM/YYYY date string into a day ordinal (see date.toordinal)"""
+    return datetime.strptime(text, DATE_FORMAT).toordinal()
+
+
+@lru_cache(maxsize=4096)
+def format_day(day):
+    """Format a day ordinal as a DD/MM/YYYY string"""
+    return date.fromordinal(day).strftime(DATE_FORMAT)
+
+
+def valid_customer_name(name):
+    """Return True if a customer name holds no line breaks or other control characters"""
+    return not any(ord(char) < 32 or ord(char) == 127 for char in name)
+
+
+class Reservation:
+    """
+    A guest's stay in a room, from the check-in day up to (not including) the check-out day.
+
+    Days are stored as integer ordinals, so stay lengths, overlaps and
+    ordering are plain integer arithmetic.
+    """
+    __slots__ = ("customer_name", "start", "end")
+
+    def __init__(self, customer_name, start, end):
+        """
+        Initializes a Reservation from check-in and check-out day ordinals.
+
+        Raises:
+            ValueError: If check-out is not after check-in.
+        """
+        if end <= start:
+            raise ValueError("Check-out must be after check-in")
+        self.customer_name = customer_name
+        self.start = start
+        self.end = end
+
+    @classmethod
+    def parse(cls, customer_name, check_in, check_out):
+        """
+        Creates a Reservation from DD/MM/YYYY date strings.
+
+        Raises:
+            ValueError: If a date is not DD/MM/YYYY or check-out is not after check-in.
+        """
+        return cls(customer_name, parse_day(check_in), parse_day(check_out))
+
+    @classmethod
+    def for_booking(cls, customer_name, check_in, check_out):
+        """
+        Creates the Reservation for a new booking from DD/MM/YYYY date strings.
+
+        Raises:
+            ValueError: If a date is not DD/MM/YYYY or check-out is not 1 to
+                MAX_STAY_NIGHTS nights after check-in.
+        """
+        reservation = cls.parse(customer_name, check_in, check_out)
+        if reservation.nights > MAX_STAY_NIGHTS:
+            raise ValueError(f"Stays are limited to {MAX_STAY_NIGHTS} nights")
+        return reservation
+
+    @property
+    def check_in(self):
+        return format_day(self.start)
+
+    @property
+    def check_out(self):
+        return format_day(self.end)
+
+    @property
+    def nights(self):
+        return self.end - self.start
+
+    def __repr__(self):
+        return f"Reservation(Customer={self.customer_name}, CheckIn={self.check_in}, CheckOut={self.check_out})"
+
+    def __eq__(self, other):
+        if not isinstance(other, Reservation):
+            return NotImplemented
+        return (self.customer_name == other.customer_name and
+                self.start == other.start and
+                self.end == other.end)
+
+
+class RoomCalendar:
+    """
+    The reservations of one room, kept sorted by check-in and never overlapping.
+
+    Because stays cannot overlap, their check-out dates are sorted too, so an
+    overlap query only has to look at the one stay found by a binary search.
+    """
+    __slots__ = ("starts", "reservations")
+
+    def __init__(self):
+        """Initializes an empty RoomCalendar."""
+        self.starts = []
+        self.reservations = []
+
+    def __len__(self):
+        return len(self.reservations)
+
+    def __iter__(self):
+        return iter(self.reservations)
+
+    def copy(self):
+        """Return a calendar holding the same reservations"""
+        calendar = RoomCalendar()
+        calendar.starts = list(self.starts)
+        calendar.reservations = list(self.reservations)
+        return calendar
+
+    def first(self):
+        """Return the earliest reservation, or None"""
+        return self.reservations[0] if self.reservations else None
+
+    def is_free(self, start, end):
+        """Return True if no reservation overlaps the stay [start, end)"""
+        i = bisect_left(self.starts, end)
+        return i == 0 or self.reservations[i - 1].end <= start
+
+    def add(self, reservation):
+        """Insert a reservation; returns False if it overlaps an existing one"""
+        if not self.is_free(reservation.start, reservation.end):
+            return False
+        i = bisect_left(self.starts, reservation.start)
+        self.starts.insert(i, reservation.start)
+        self.reservations.insert(i, reservation)
+        return True
+
+    def find(self, start):
+        """Return the reservation checking in on `start`, or None"""
+        i = bisect_left(self.starts, start)
+        if i < len(self.starts) and self.starts[i] == start:
+            return self.reservations[i]
+        return None
+
+    def remove(self, reservation):
+        """Remove a reservation held by this calendar"""
+        i = bisect_left(self.starts, reservation.start)
+        del self.starts[i]
+        del self.reservations[i]
+
 
 class Room:
     """
     Represents a hotel room.
     """
-    def __init__(self, room_number, is_ac=False, is_double_bed=False, is_booked=False, customer_name="", check_in="", check_out=""):
-        """Initializes a Room object."""
+    __slots__ = ("room_number", "is_ac", "is_double_bed", "is_booked", "customer_name", "check_in", "check_out",
+                 "reservations", "version")
+
+    def __init__(self, room_number, is_ac=False, is_double_bed=False, is_booked=False, customer_name="", check_in="", check_out="",
+                 reservations=None, version=0):
+        """
+        Initializes a Room object.
+
+        customer_name, check_in and check_out describe the current (earliest)
+        stay; `reservations` is the RoomCalendar holding every stay, or None
+        while the room has none. A booked room given without a calendar gets
+        one built from its current stay. `version` counts the bookings and
+        checkouts made since the room was loaded (see RoomVersionConflict).
+        """
         self.room_number = room_number
         self.is_ac = is_ac
         self.is_double_bed = is_double_bed
@@ -19,6 +210,16 @@ class Room:
         self.customer_name = customer_name
         self.check_in = check_in
         self.check_out = check_out
+        self.reservations = reservations
+        self.version = version
+        if is_booked and reservations is None:
+            try:
+                reservation = Reservation.parse(customer_name, check_in, check_out)
+            except ValueError:
+                # Left booked without a calendar; check_out still clears it
+                return
+            self.reservations = RoomCalendar()
+            self.reservations.add(reservation)
 
     def __repr__(self):
         """
@@ -41,125 +242,2188 @@ class Room:
                 self.check_out == other.check_out)
 
 
+def copy_room(room):
+    """Return a Room holding the same data as `room`, which may be a RoomView"""
+    return Room(room.room_number, room.is_ac, room.is_double_bed, room.is_booked, room.customer_name,
+                room.check_in, room.check_out,
+                None if room.reservations is None else room.reservations.copy(), room.version)
+
+
+def sync_current_stay(room):
+    """Mirror a room's earliest reservation into its is_booked/customer/date fields"""
+    current = room.reservations.first() if room.reservations is not None else None
+    if current is None:
+        room.reservations = None
+        room.is_booked = False
+        room.customer_name = ""
+        room.check_in = ""
+        room.check_out = ""
+    else:
+        room.is_booked = True
+        room.customer_name = current.customer_name
+        room.check_in = current.check_in
+        room.check_out = current.check_out
+
+
+def add_reservation(room, reservation):
+    """Add a reservation to a room; returns False if it overlaps a stay the room already holds"""
+    if room.reservations is None:
+        if room.is_booked:
+            return False
+        room.reservations = RoomCalendar()
+    if not room.reservations.add(reservation):
+        return False
+    sync_current_stay(room)
+    return True
+
+
+def remove_reservation(room, check_in=None):
+    """
+    Remove the reservation checking in on `check_in`, or the current one by default.
+
+    Returns:
+        The removed Reservation, or None if there was no such reservation.
+    """
+    if room.reservations is None:
+        if room.is_booked and check_in is None:
+            sync_current_stay(room)
+        return None
+    if check_in is None:
+        reservation = room.reservations.first()
+    else:
+        try:
+            reservation = room.reservations.find(parse_day(check_in))
+        except ValueError:
+            return None
+    if reservation is None:
+        return None
+    room.reservations.remove(reservation)
+    sync_current_stay(room)
+    return reservation
+
+
+def room_stays(room):
+    """Yield (customer_name, check_in, check_out) for every stay in a room, current stay first"""
+    if room.reservations is not None:
+        for reservation in room.reservations:
+            yield reservation.customer_name, reservation.check_in, reservation.check_out
+    elif room.is_booked:
+        yield room.customer_name, room.check_in, room.check_out
+
+
+class RoomView(tuple):
+    """
+    A Room-like view of one slot in a RoomTable.
+
+    It is a (table, slot) tuple underneath so that RoomTable can build
+    views for a whole query result in C via tuple.__new__.
+    """
+    __slots__ = ()
+
+    def __new__(cls, table, slot):
+        """Creates a RoomView over `slot` of `table`."""
+        return tuple.__new__(cls, (table, slot))
+
+    table = property(itemgetter(0))
+    slot = property(itemgetter(1))
+
+    @property
+    def room_number(self):
+        return self.table.numbers[self.slot]
+
+    @room_number.setter
+    def room_number(self, value):
+        self.table.numbers[self.slot] = value
+
+    @property
+    def is_ac(self):
+        return self.table.get_flag(self.table.ac_bits, self.slot)
+
+    @is_ac.setter
+    def is_ac(self, value):
+        self.table.set_flag(self.table.ac_bits, self.slot, value)
+
+    @property
+    def is_double_bed(self):
+        return self.table.get_flag(self.table.double_bed_bits, self.slot)
+
+    @is_double_bed.setter
+    def is_double_bed(self, value):
+        self.table.set_flag(self.table.double_bed_bits, self.slot, value)
+
+    @property
+    def is_booked(self):
+        return self.table.get_flag(self.table.booked_bits, self.slot)
+
+    @is_booked.setter
+    def is_booked(self, value):
+        self.table.set_flag(self.table.booked_bits, self.slot, value)
+
+    @property
+    def customer_name(self):
+        return self.table.customer_names[self.slot]
+
+    @customer_name.setter
+    def customer_name(self, value):
+        self.table.customer_names[self.slot] = value
+
+    @property
+    def check_in(self):
+        return self.table.check_ins[self.slot]
+
+    @check_in.setter
+    def check_in(self, value):
+        self.table.check_ins[self.slot] = value
+
+    @property
+    def check_out(self):
+        return self.table.check_outs[self.slot]
+
+    @check_out.setter
+    def check_out(self, value):
+        self.table.check_outs[self.slot] = value
+
+    @property
+    def reservations(self):
+        return self.table.calendars[self.slot]
+
+    @reservations.setter
+    def reservations(self, value):
+        self.table.calendars[self.slot] = value
+
+    @property
+    def version(self):
+        return self.table.versions[self.slot]
+
+    @version.setter
+    def version(self, value):
+        self.table.versions[self.slot] = value
+
+    def __repr__(self):
+        """
+        Returns the same representation as the equivalent Room.
+        """
+        return f"Room(number={self.room_number}, AC={self.is_ac}, DoubleBed={self.is_double_bed}, Booked={self.is_booked}, Customer={self.customer_name}, CheckIn={self.check_in}, CheckOut={self.check_out})"
+
+    def __eq__(self, other):
+        """
+        Compares equal to any Room or RoomView holding the same data.
+        """
+        if not isinstance(other, (Room, RoomView)):
+            return NotImplemented
+        return (self.room_number == other.room_number and
+                self.is_ac == other.is_ac and
+                self.is_double_bed == other.is_double_bed and
+                self.is_booked == other.is_booked and
+                self.customer_name == other.customer_name and
+                self.check_in == other.check_in and
+                self.check_out == other.check_out)
+
+
+class RoomTable:
+    """
+    Columnar room store: room numbers in an array, flags in packed bitsets.
+
+    Behaves like a list of rooms, handing out RoomView objects, so it can be
+    used as HotelManager.rooms in place of a list of Room objects.
+    """
+    def __init__(self, rooms=()):
+        """Initializes the RoomTable with a copy of the given rooms."""
+        self.numbers = array('I')
+        self.ac_bits = bytearray()
+        self.double_bed_bits = bytearray()
+        self.booked_bits = bytearray()
+        self.customer_names = []
+        self.check_ins = []
+        self.check_outs = []
+        self.calendars = []
+        self.versions = array('Q')
+        for room in rooms:
+            self.append(room)
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def __getitem__(self, slot):
+        if isinstance(slot, slice):
+            return [RoomView(self, i) for i in range(*slot.indices(len(self)))]
+        if slot < 0:
+            slot += len(self)
+        if not 0 <= slot < len(self):
+            raise IndexError("room slot out of range")
+        return RoomView(self, slot)
+
+    def __iter__(self):
+        for slot in range(len(self)):
+            yield RoomView(self, slot)
+
+    def __delitem__(self, slot):
+        if slot < 0:
+            slot += len(self)
+        del self.numbers[slot]
+        del self.customer_names[slot]
+        del self.check_ins[slot]
+        del self.check_outs[slot]
+        del self.calendars[slot]
+        del self.versions[slot]
+        size = (len(self.numbers) + 7) // 8
+        for name in ("ac_bits", "double_bed_bits", "booked_bits"):
+            bits = drop_bit(int.from_bytes(getattr(self, name), 'little'), slot)
+            setattr(self, name, bytearray(bits.to_bytes(size, 'little')))
+
+    def copy(self):
+        """Return a RoomTable holding the same data, sharing no mutable state with this one"""
+        table = RoomTable()
+        table.numbers = array('I', self.numbers)
+        table.ac_bits = bytearray(self.ac_bits)
+        table.double_bed_bits = bytearray(self.double_bed_bits)
+        table.booked_bits = bytearray(self.booked_bits)
+        table.customer_names = list(self.customer_names)
+        table.check_ins = list(self.check_ins)
+        table.check_outs = list(self.check_outs)
+        table.calendars = [None if calendar is None else calendar.copy() for calendar in self.calendars]
+        table.versions = array('Q', self.versions)
+        return table
+
+    def append(self, room):
+        """Add a room to the end of the table"""
+        slot = len(self.numbers)
+        self.numbers.append(room.room_number)
+        if slot % 8 == 0:
+            self.ac_bits.append(0)
+            self.double_bed_bits.append(0)
+            self.booked_bits.append(0)
+        self.customer_names.append(room.customer_name)
+        self.check_ins.append(room.check_in)
+        self.check_outs.append(room.check_out)
+        self.calendars.append(room.reservations)
+        self.versions.append(room.version)
+        self.set_flag(self.ac_bits, slot, room.is_ac)
+        self.set_flag(self.double_bed_bits, slot, room.is_double_bed)
+        self.set_flag(self.booked_bits, slot, room.is_booked)
+
+    @staticmethod
+    def get_flag(bits, slot):
+        """Read one bit of a bitset"""
+        return bool(bits[slot >> 3] & (1 << (slot & 7)))
+
+    @staticmethod
+    def set_flag(bits, slot, value):
+        """Set or clear one bit of a bitset"""
+        if value:
+            bits[slot >> 3] |= 1 << (slot & 7)
+        else:
+            bits[slot >> 3] &= ~(1 << (slot & 7)) & 0xFF
+
+    def feature_mask(self, want_ac=None, want_double_bed=None):
+        """Return an integer whose set bits are the slots of rooms with the wanted features"""
+        everything = (1 << len(self)) - 1
+        mask = everything
+        for wanted, bits in ((want_ac, self.ac_bits), (want_double_bed, self.double_bed_bits)):
+            if wanted is not None:
+                flags = int.from_bytes(bits, 'little')
+                mask &= flags if wanted else everything & ~flags
+        return mask
+
+    def available_mask(self, want_ac=None, want_double_bed=None):
+        """Return an integer whose set bits are the slots of matching free rooms"""
+        return self.feature_mask(want_ac, want_double_bed) & ~int.from_bytes(self.booked_bits, 'little')
+
+    def views(self, mask):
+        """Return views of the slots set in `mask`, in table order"""
+        return self.views_at(iter_set_bits(mask))
+
+    def views_at(self, slots):
+        """Return views of the given slots"""
+        return list(map(tuple.__new__, repeat(RoomView), zip(repeat(self), slots)))
+
+    def count_available(self, want_ac=None, want_double_bed=None):
+        """Count matching free rooms with a single popcount"""
+        return self.available_mask(want_ac, want_double_bed).bit_count()
+
+    def available(self, want_ac=None, want_double_bed=None):
+        """Return views of the matching free rooms in table order"""
+        return self.views(self.available_mask(want_ac, want_double_bed))
+
+
+def drop_bit(mask, position):
+    """Remove one bit from an integer bitset, shifting the higher bits down"""
+    low = mask & ((1 << position) - 1)
+    return low | ((mask >> (position + 1)) << position)
+
+
+def iter_set_bits(mask):
+    """Yield the positions of the set bits of a non-negative integer, lowest first"""
+    # Searching the binary string keeps the per-bit work in C for wide masks
+    digits = bin(mask)[:1:-1]
+    position = digits.find("1")
+    while position != -1:
+        yield position
+        position = digits.find("1", position + 1)
+
+
+def mask_from_slots(slots, size):
+    """Return an integer bitset with the given positions (below `size`) set, built in one pass"""
+    bits = bytearray((size + 7) // 8)
+    for slot in slots:
+        bits[slot >> 3] |= 1 << (slot & 7)
+    return int.from_bytes(bits, 'little')
+
+
+class NightIndex:
+    """
+    Inventory-wide occupancy index: one bitmap per night over room slots.
+
+    Bit `slot` of a night's bitmap is set when the room in that slot is taken
+    that night, so "which rooms are free between D1 and D2" is the OR of the
+    bitmaps for the nights in the window, complemented, without visiting any
+    room. Rooms that are booked without a readable stay are always taken.
+    """
+    def __init__(self, rooms=()):
+        """
+        Initializes the NightIndex from the rooms in their slot order.
+
+        The slots taken each night are gathered first and every bitmap is
+        built once, so the cost grows with the number of booked nights
+        rather than with that times the inventory size.
+        """
+        ac_slots = []
+        double_bed_slots = []
+        blocked_slots = []
+        night_slots = {}
+        for slot, room in enumerate(rooms):
+            if room.is_ac:
+                ac_slots.append(slot)
+            if room.is_double_bed:
+                double_bed_slots.append(slot)
+            if room.reservations is not None:
+                for reservation in room.reservations:
+                    for night in range(reservation.start, reservation.end):
+                        night_slots.setdefault(night, []).append(slot)
+            elif room.is_booked:
+                blocked_slots.append(slot)
+        self.size = len(rooms)
+        self.ac_mask = mask_from_slots(ac_slots, self.size)
+        self.double_bed_mask = mask_from_slots(double_bed_slots, self.size)
+        self.blocked_mask = mask_from_slots(blocked_slots, self.size)
+        self.nights = {night: mask_from_slots(slots, self.size) for night, slots in night_slots.items()}
+
+    def append(self, room):
+        """Index a room added after the last slot"""
+        slot = self.size
+        self.size += 1
+        if room.is_ac:
+            self.ac_mask |= 1 << slot
+        if room.is_double_bed:
+            self.double_bed_mask |= 1 << slot
+        if room.reservations is not None:
+            for reservation in room.reservations:
+                self.add(slot, reservation)
+        elif room.is_booked:
+            self.blocked_mask |= 1 << slot
+
+    def delete(self, slot):
+        """Drop a slot, shifting the rooms after it down by one"""
+        self.size -= 1
+        self.ac_mask = drop_bit(self.ac_mask, slot)
+        self.double_bed_mask = drop_bit(self.double_bed_mask, slot)
+        self.blocked_mask = drop_bit(self.blocked_mask, slot)
+        for night, mask in list(self.nights.items()):
+            mask = drop_bit(mask, slot)
+            if mask:
+                self.nights[night] = mask
+            else:
+                del self.nights[night]
+
+    def add(self, slot, reservation):
+        """Mark the nights of a reservation as taken for one slot"""
+        bit = 1 << slot
+        nights = self.nights
+        for night in range(reservation.start, reservation.end):
+            nights[night] = nights.get(night, 0) | bit
+
+    def remove(self, slot, reservation):
+        """Free the nights of a reservation for one slot"""
+        if reservation is None:
+            self.blocked_mask &= ~(1 << slot)
+            return
+        bit = 1 << slot
+        nights = self.nights
+        for night in range(reservation.start, reservation.end):
+            mask = nights.get(night, 0) & ~bit
+            if mask:
+                nights[night] = mask
+            else:
+                nights.pop(night, None)
+
+    def free_mask(self, start, end, want_ac=None, want_double_bed=None):
+        """
+        Return the slots of matching rooms that are free every night in [start, end).
+
+        Raises:
+            ValueError: If end is not after start, or more than MAX_STAY_NIGHTS after it.
+        """
+        if end <= start:
+            raise ValueError("Check-out must be after check-in")
+        if end - start > MAX_STAY_NIGHTS:
+            raise ValueError(f"Stays are limited to {MAX_STAY_NIGHTS} nights")
+        everything = (1 << self.size) - 1
+        taken = self.blocked_mask
+        nights = self.nights
+        for night in range(start, end):
+            taken |= nights.get(night, 0)
+        mask = everything & ~taken
+        if want_ac is not None:
+            mask &= self.ac_mask if want_ac else ~self.ac_mask
+        if want_double_bed is not None:
+            mask &= self.double_bed_mask if want_double_bed else ~self.double_bed_mask
+        return mask
+
+
+class RoomChange:
+    """
+    A booking or checkout of one reservation, as handed to a RoomStorage.
+
+    The "save" action stands for a full rewrite of the inventory.
+    """
+    __slots__ = ("action", "room_number", "is_booked", "reservation")
+
+    def __init__(self, action, room_number=None, is_booked=False, reservation=None):
+        """
+        Initializes a RoomChange.
+
+        Args:
+            action: "book", "checkout" or "save".
+            room_number: The room that changed.
+            is_booked: Whether the room still holds a reservation after the change.
+            reservation: The Reservation booked or checked out, or None for a booking without readable dates.
+        """
+        self.action = action
+        self.room_number = room_number
+        self.is_booked = is_booked
+        self.reservation = reservation
+
+
+FSYNC_POLICIES = ("always", "batched", "never")
+
+
+def fsync_directory(path):
+    """Make a rename into the directory holding `path` durable"""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        # Directories cannot be opened on every platform (e.g. Windows)
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class FileLock:
+    """
+    Advisory lock on a side file, shared by every process using the same store.
+
+    Uses fcntl.flock, or msvcrt.locking on Windows. The lock is re-entrant
+    within a process: threads queue on an RLock, and only the outermost
+    acquire touches the file.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.thread_lock = threading.RLock()
+        self.depth = 0
+        self.file = None
+
+    def acquire(self):
+        """Block until this process holds the lock"""
+        self.thread_lock.acquire()
+        self.depth += 1
+        if self.depth > 1:
+            return
+        try:
+            if self.file is None:
+                self.file = open(self.path, mode='a+b')
+            if fcntl is not None:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+            else:
+                self.file.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        # LK_LOCK gives up after ten seconds; keep waiting
+                        pass
+        except BaseException:
+            self.depth -= 1
+            self.thread_lock.release()
+            raise
+
+    def release(self):
+        """Release one level of the lock"""
+        self.depth -= 1
+        try:
+            if self.depth == 0:
+                if fcntl is not None:
+                    fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+                else:
+                    self.file.seek(0)
+                    msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self.thread_lock.release()
+
+    def close(self):
+        """Close the lock file"""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+def write_room_rows(file, rooms):
+    """
+    Write rooms to an open CSV file in the snapshot format.
+
+    Each room gets one row for its current stay; further reservations
+    follow as extra rows repeating the room number.
+    """
+    writer = csv.writer(file)
+    writer.writerow([
+        "RoomNumber", "AC", "DoubleBed", "Booked",
+        "CustomerName", "CheckInDate", "CheckOutDate"
+    ])
+    for room in rooms:
+        writer.writerow([
+            room.room_number,
+            int(room.is_ac),
+            int(room.is_double_bed),
+            int(room.is_booked),
+            room.customer_name,
+            room.check_in,
+            room.check_out
+        ])
+        if room.reservations is not None:
+            for stay in islice(room_stays(room), 1, None):
+                writer.writerow([room.room_number, int(room.is_ac), int(room.is_double_bed), 1, *stay])
+
+
+def read_room_rows(file):
+    """Read the rooms from an open CSV file in the snapshot format, in file order"""
+    rooms = []
+    by_number = {}
+    reader = csv.reader(file)
+    next(reader)  
+    for row in reader:
+        room = by_number.get(int(row[0]))
+        if room is not None:
+            try:
+                add_reservation(room, Reservation.parse(row[4], row[5], row[6]))
+            except ValueError:
+                pass
+            continue
+        room = Room(
+            room_number=int(row[0]),
+            is_ac=bool(int(row[1])),
+            is_double_bed=bool(int(row[2])),
+            is_booked=bool(int(row[3])),
+            customer_name=row[4],
+            check_in=row[5],
+            check_out=row[6]
+        )
+        rooms.append(room)
+        by_number[room.room_number] = room
+    return rooms
+
+
+class RoomStorage:
+    """
+    Base class for the places room data can be persisted to.
+    """
+    # True if available_room_numbers answers from disk rather than returning None
+    queries_on_disk = False
+
+    def exists(self):
+        """Return True if the store already holds an inventory"""
+        raise NotImplementedError
+
+    def load(self):
+        """Return the stored rooms as a list of Room objects"""
+        raise NotImplementedError
+
+    def save(self, rooms):
+        """Replace the stored inventory with the given rooms"""
+        raise NotImplementedError
+
+    def record_changes(self, changes, rooms):
+        """Persist a batch of RoomChanges; by default the whole inventory is rewritten once"""
+        self.save(rooms)
+
+    def needs_rooms(self, changes):
+        """Return True if record_changes(changes, rooms) will read `rooms`; otherwise None may be passed"""
+        return True
+
+    def compact(self, rooms):
+        """Fold incremental changes into a fresh copy of the inventory"""
+        self.save(rooms)
+
+    def available_room_numbers(self, want_ac=None, want_double_bed=None):
+        """Return matching free room numbers, or None if the store cannot answer the query itself"""
+        return None
+
+    def locked(self):
+        """Return a context manager holding the store against other processes; a no-op by default"""
+        return nullcontext()
+
+    def read_external_changes(self):
+        """
+        Return the RoomChanges other processes have made since this one last
+        read or wrote the store, or None if the rooms must be reloaded in full.
+        Stores that are not shared report no changes.
+        """
+        return []
+
+    def close(self):
+        """Release any resources held by the store"""
+
+
+class CsvStorage(RoomStorage):
+    """
+    Stores rooms in a CSV snapshot with an optional append-only journal.
+    """
+    def __init__(self, csv_file, journal=False, compact_every=500, fsync="batched", fsync_every=32, shared=False):
+        """
+        Initializes the CsvStorage.
+
+        Args:
+            csv_file: Path of the room snapshot.
+            journal: Append one record per booking/checkout instead of rewriting the snapshot.
+            compact_every: Number of journal records after which the journal is folded into a fresh snapshot.
+            fsync: "always" syncs every snapshot and journal append to disk; "batched" syncs
+                every snapshot but only every `fsync_every`-th journal append; "never" leaves it
+                to the operating system.
+            fsync_every: Journal appends per fsync under the "batched" policy.
+            shared: Let several processes use the files at once. Access is then
+                serialized by an advisory lock on a ".lock" file, and each process
+                catches up by reading only the journal records it has not seen.
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}")
+        self.csv_file = csv_file
+        self.journal_file = os.path.splitext(csv_file)[0] + ".journal"
+        self.use_journal = journal
+        self.compact_every = compact_every
+        self.journal_entries = 0
+        self.fsync = fsync
+        self.fsync_every = fsync_every
+        self.unsynced_appends = 0
+        self.file_lock = FileLock(os.path.splitext(csv_file)[0] + ".lock") if shared else None
+        # How far this process has read or written: which snapshot, and the
+        # journal byte offset up to which every record has been applied
+        self.snapshot_stamp = None
+        self.journal_offset = None
+
+    def exists(self):
+        """Return True if a snapshot file is present"""
+        return os.path.exists(self.csv_file)
+
+    def locked(self):
+        """Hold the inter-process lock in shared mode"""
+        return self.file_lock if self.file_lock is not None else nullcontext()
+
+    def current_stamp(self):
+        """Identify the snapshot file on disk; a new one is written under a new inode"""
+        try:
+            stat = os.stat(self.csv_file)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def read_external_changes(self):
+        """
+        Return the changes other processes have journaled since this one last
+        read or wrote the files, or None if they replaced the snapshot.
+        Call with the store locked.
+        """
+        stamp = self.current_stamp()
+        if self.file_lock is None or stamp is None:
+            return []
+        if stamp != self.snapshot_stamp or self.journal_offset is None:
+            return None
+        rows, self.journal_offset = self.read_journal(self.journal_offset)
+        self.journal_entries += len(rows)
+        return [self.journal_change(row) for row in rows]
+
+    def save(self, rooms):
+        """
+        Save all room data to CSV file and discard the journal it supersedes.
+
+        Rows are written by write_room_rows. The snapshot is written to a
+        temporary file that then atomically replaces the old one, so a crash
+        mid-write leaves the previous snapshot intact.
+        """
+        temp_file = self.csv_file + ".tmp"
+        with open(temp_file, mode='w', newline='') as file:
+            write_room_rows(file, rooms)
+            if self.fsync != "never":
+                file.flush()
+                os.fsync(file.fileno())
+        os.replace(temp_file, self.csv_file)
+        if self.fsync != "never":
+            # The new snapshot must be durable before the journal it replaces goes away
+            fsync_directory(self.csv_file)
+        if os.path.exists(self.journal_file):
+            os.remove(self.journal_file)
+        self.journal_entries = 0
+        self.unsynced_appends = 0
+        self.snapshot_stamp = self.current_stamp()
+        self.journal_offset = 0
+
+    def load(self):
+        """Load room data from CSV file, then replay any journaled changes on top of it"""
+        self.snapshot_stamp = self.current_stamp()
+        with open(self.csv_file, mode='r') as file:
+            rooms = read_room_rows(file)
+        self.replay_journal({room.room_number: room for room in rooms})
+        return rooms
+
+    def append_journal(self, changes):
+        """
+        Append booking changes to the journal, one record each.
+
+        Several changes are preceded by a "batch,<count>" header so that
+        replay applies them all or, if the append was cut short, none.
+        """
+        with open(self.journal_file, mode='a', newline='') as file:
+            # Drop the remains of an append cut short by a crash, so that
+            # they cannot run into the records written after them
+            if self.journal_offset is not None and file.seek(0, os.SEEK_END) > self.journal_offset:
+                complete_end = self.read_journal(self.journal_offset)[1]
+                if file.tell() > complete_end:
+                    file.truncate(complete_end)
+            writer = csv.writer(file)
+            if len(changes) > 1:
+                writer.writerow(["batch", len(changes)])
+            for change in changes:
+                reservation = change.reservation
+                stay = ("", "", "") if reservation is None else (
+                    reservation.customer_name, reservation.check_in, reservation.check_out)
+                writer.writerow([change.action, change.room_number, *stay])
+            self.unsynced_appends += 1
+            if self.fsync == "always" or (self.fsync == "batched" and self.unsynced_appends >= self.fsync_every):
+                file.flush()
+                os.fsync(file.fileno())
+                self.unsynced_appends = 0
+            file.flush()
+            self.journal_offset = file.buffer.tell()
+        self.journal_entries += len(changes)
+
+    def read_journal(self, offset=0):
+        """
+        Return the complete journal records from byte `offset` on, and the offset just past them.
+
+        A crash mid-append can leave a truncated last line or a batch missing
+        some of its records behind; neither is returned or counted.
+        """
+        try:
+            with open(self.journal_file, mode='rb') as file:
+                file.seek(offset)
+                data = file.read()
+        except FileNotFoundError:
+            return [], offset
+        records = []
+        consumed = 0
+        entries = self.split_records(data)
+        for raw, row in entries:
+            if len(row) == 2 and row[0] == "batch" and row[1].isdigit():
+                batch = list(islice(entries, int(row[1])))
+                if len(batch) < int(row[1]):
+                    break
+                if all(self.is_journal_record(record) for _, record in batch):
+                    records.extend(record for _, record in batch)
+                consumed += len(raw) + sum(len(batch_raw) for batch_raw, _ in batch)
+                continue
+            if self.is_journal_record(row):
+                records.append(row)
+            consumed += len(raw)
+        return records, offset + consumed
+
+    @staticmethod
+    def split_records(data):
+        """
+        Yield (bytes, row) for each complete CSV record in `data`.
+
+        A quoted field may hold line breaks, so a record runs on until its
+        quotes balance and a line ends; an unterminated tail is left out.
+        """
+        pending = b""
+        for line in data.splitlines(keepends=True):
+            pending += line
+            if pending.count(b'"') % 2 or not pending.endswith(b"\n"):
+                continue
+            yield pending, next(csv.reader(io.TextIOWrapper(io.BytesIO(pending), newline='')))
+            pending = b""
+
+    def replay_journal(self, by_number):
+        """Apply journaled changes to the rooms loaded from the snapshot, given by room number"""
+        rows, self.journal_offset = self.read_journal()
+        self.journal_entries = len(rows)
+        for row in rows:
+            self.replay_record(by_number, row)
+
+    @staticmethod
+    def is_journal_record(row):
+        """Return True if a journal row is a complete book/checkout record"""
+        return len(row) == 5 and row[1].isdigit()
+
+    @staticmethod
+    def journal_change(row):
+        """Turn a journal record into a RoomChange"""
+        try:
+            reservation = Reservation.parse(row[2], row[3], row[4])
+        except ValueError:
+            reservation = None
+        return RoomChange(row[0], int(row[1]), reservation=reservation)
+
+    def replay_record(self, by_number, row):
+        """Apply one journal record"""
+        room = by_number.get(int(row[1]))
+        if room is None:
+            return
+        # Records already folded into the snapshot are skipped
+        # naturally: re-adding a stay overlaps itself, and removing
+        # one that is gone finds nothing
+        if row[0] == "book":
+            try:
+                add_reservation(room, Reservation.parse(row[2], row[3], row[4]))
+            except ValueError:
+                pass
+        elif row[0] == "checkout":
+            remove_reservation(room, row[3] or None)
+
+    def needs_rooms(self, changes):
+        """Only snapshots and compactions read the rooms"""
+        return (not self.use_journal or any(change.action == "save" for change in changes) or
+                self.journal_entries + len(changes) >= self.compact_every)
+
+    def record_changes(self, changes, rooms):
+        """Persist changes as journal records, or as one full snapshot when not journaling"""
+        if not self.use_journal or any(change.action == "save" for change in changes):
+            self.save(rooms)
+            return
+        self.append_journal(changes)
+        if self.journal_entries >= self.compact_every:
+            self.compact(rooms)
+
+    def close(self):
+        """Release the inter-process lock file"""
+        if self.file_lock is not None:
+            self.file_lock.close()
+
+
+class SqliteStorage(RoomStorage):
+    """
+    Stores rooms and bookings as rows in an SQLite database.
+    """
+    queries_on_disk = True
+    SYNCHRONOUS = {"always": "FULL", "batched": "NORMAL", "never": "OFF"}
+
+    def __init__(self, db_file, fsync="batched"):
+        """
+        Initializes the SqliteStorage.
+
+        Args:
+            db_file: Path of the SQLite database, created on first use.
+            fsync: "always", "batched" or "never", mapped onto SQLite's synchronous
+                setting; "batched" also switches to WAL mode so commits are synced
+                at checkpoints rather than one by one.
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}")
+        self.db_file = db_file
+        # Writes may come from the PersistenceWorker thread
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        if fsync == "batched":
+            self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute(f"PRAGMA synchronous = {self.SYNCHRONOUS[fsync]}")
+        with self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS rooms (
+                    room_number INTEGER PRIMARY KEY,
+                    is_ac INTEGER NOT NULL,
+                    is_double_bed INTEGER NOT NULL,
+                    is_booked INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS rooms_availability
+                    ON rooms (is_booked, is_ac, is_double_bed);
+                CREATE TABLE IF NOT EXISTS bookings (
+                    id INTEGER PRIMARY KEY,
+                    room_number INTEGER NOT NULL REFERENCES rooms (room_number),
+                    customer_name TEXT NOT NULL,
+                    check_in TEXT NOT NULL,
+                    check_out TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS bookings_room ON bookings (room_number);
+            """)
+
+    def exists(self):
+        """Return True if the database holds any rooms"""
+        return self.conn.execute("SELECT 1 FROM rooms LIMIT 1").fetchone() is not None
+
+    def load(self):
+        """Load rooms joined with their bookings"""
+        rows = self.conn.execute("""
+            SELECT r.room_number, r.is_ac, r.is_double_bed, r.is_booked,
+                   b.customer_name, b.check_in, b.check_out
+            FROM rooms r LEFT JOIN bookings b ON b.room_number = r.room_number
+            ORDER BY r.room_number, b.id
+        """)
+        rooms = []
+        for row in rows:
+            if rooms and rooms[-1].room_number == row[0]:
+                try:
+                    add_reservation(rooms[-1], Reservation.parse(row[4], row[5], row[6]))
+                except ValueError:
+                    pass
+                continue
+            rooms.append(Room(
+                room_number=row[0],
+                is_ac=bool(row[1]),
+                is_double_bed=bool(row[2]),
+                is_booked=bool(row[3]),
+                customer_name=row[4] or "",
+                check_in=row[5] or "",
+                check_out=row[6] or ""
+            ))
+        return rooms
+
+    def save(self, rooms):
+        """Replace every room and booking row in one transaction"""
+        with self.conn:
+            self.conn.execute("DELETE FROM bookings")
+            self.conn.execute("DELETE FROM rooms")
+            self.conn.executemany(
+                "INSERT INTO rooms (room_number, is_ac, is_double_bed, is_booked) VALUES (?, ?, ?, ?)",
+                ((r.room_number, int(r.is_ac), int(r.is_double_bed), int(r.is_booked)) for r in rooms))
+            self.conn.executemany(
+                "INSERT INTO bookings (room_number, customer_name, check_in, check_out) VALUES (?, ?, ?, ?)",
+                ((r.room_number, *stay) for r in rooms for stay in room_stays(r)))
+
+    def needs_rooms(self, changes):
+        """Only a full save reads the rooms"""
+        return any(change.action == "save" for change in changes)
+
+    def record_changes(self, changes, rooms):
+        """Update only the rows belonging to the changed rooms, in one transaction"""
+        if any(change.action == "save" for change in changes):
+            self.save(rooms)
+            return
+        with self.conn:
+            for change in changes:
+                reservation = change.reservation
+                if change.action == "book":
+                    self.conn.execute(
+                        "INSERT INTO bookings (room_number, customer_name, check_in, check_out) VALUES (?, ?, ?, ?)",
+                        (change.room_number, reservation.customer_name, reservation.check_in, reservation.check_out))
+                elif change.action == "checkout":
+                    if reservation is None:
+                        self.conn.execute("DELETE FROM bookings WHERE room_number = ?", (change.room_number,))
+                    else:
+                        self.conn.execute("DELETE FROM bookings WHERE room_number = ? AND check_in = ?",
+                                          (change.room_number, reservation.check_in))
+                self.conn.execute("UPDATE rooms SET is_booked = ? WHERE room_number = ?",
+                                  (int(change.is_booked), change.room_number))
+
+    def available_room_numbers(self, want_ac=None, want_double_bed=None):
+        """Answer an availability filter from the rooms_availability index"""
+        query = "SELECT room_number FROM rooms WHERE is_booked = 0"
+        params = []
+        if want_ac is not None:
+            query += " AND is_ac = ?"
+            params.append(int(want_ac))
+        if want_double_bed is not None:
+            query += " AND is_double_bed = ?"
+            params.append(int(want_double_bed))
+        return [row[0] for row in self.conn.execute(query + " ORDER BY room_number", params)]
+
+    def close(self):
+        """Close the database connection"""
+        self.conn.close()
+
+
+class PersistenceWorker:
+    """
+    Write-behind persistence: a background thread writes queued RoomChanges to storage.
+
+    Everything queued while a write is in progress is written as one batch by
+    the next one, so bursts of changes coalesce into a single flush. With a
+    commit window, the worker also holds the first queued change back for up
+    to that long, or until `max_batch` changes are queued, so that changes
+    arriving together share a flush (group commit). Each submit returns a
+    sequence number that wait() can block on.
+    """
+    def __init__(self, write, retry_delay=1.0, commit_window=0.0, max_batch=64):
+        """
+        Initializes and starts the PersistenceWorker.
+
+        Args:
+            write: Callable writing a list of RoomChanges to storage (HotelManager.write_changes).
+            retry_delay: Seconds to wait before retrying a failed write.
+            commit_window: Seconds to gather further changes before a flush.
+            max_batch: Number of queued changes that triggers a flush before the window ends.
+        """
+        self.write = write
+        self.retry_delay = retry_delay
+        self.commit_window = commit_window
+        self.max_batch = max_batch
+        self.condition = threading.Condition()
+        self.pending = []
+        self.submitted = 0
+        self.durable = 0
+        self.error = None
+        self.closing = False
+        # Changes given up on because writing them still failed at close
+        self.unsaved = []
+        # (sequence, asyncio future) pairs from wait_async
+        self.waiters = []
+        self.thread = threading.Thread(target=self.run, name="hotel-persistence", daemon=True)
+        self.thread.start()
+
+    def submit(self, change):
+        """Queue a RoomChange and return its sequence number"""
+        return self.submit_many([change])
+
+    def submit_many(self, changes):
+        """Queue RoomChanges to be written in the same flush; returns the last sequence number"""
+        with self.condition:
+            self.pending.extend(changes)
+            self.submitted += len(changes)
+            self.condition.notify_all()
+            return self.submitted
+
+    def wait(self, sequence=None, timeout=None):
+        """
+        Durability barrier: block until change `sequence` (default: everything
+        submitted so far) has been written.
+
+        Returns:
+            False if the timeout expired first.
+
+        Raises:
+            The storage error, if the write is failing and being retried.
+        """
+        with self.condition:
+            if sequence is None:
+                sequence = self.submitted
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while self.durable < sequence:
+                if self.error is not None:
+                    raise self.error
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+            return True
+
+    def wait_async(self, sequence=None):
+        """
+        Asyncio counterpart of wait(): return a future that completes once
+        change `sequence` (default: everything submitted so far) is written.
+
+        The future fails with the storage error if the write fails. It must be
+        created, and awaited, on a running event loop.
+        """
+        future = asyncio.get_running_loop().create_future()
+        with self.condition:
+            if sequence is None:
+                sequence = self.submitted
+            if self.durable >= sequence:
+                future.set_result(True)
+            elif self.error is not None:
+                future.set_exception(self.error)
+            else:
+                self.waiters.append((sequence, future))
+        return future
+
+    def settle_waiters(self, error=None):
+        """Complete the wait_async futures whose changes are durable, or fail them all with `error`"""
+        if error is None:
+            ready = [(sequence, future) for sequence, future in self.waiters if sequence <= self.durable]
+            self.waiters = [(sequence, future) for sequence, future in self.waiters if sequence > self.durable]
+        else:
+            ready, self.waiters = self.waiters, []
+        for _, future in ready:
+            try:
+                future.get_loop().call_soon_threadsafe(self.settle, future, error)
+            except RuntimeError:
+                # The waiter's event loop has been closed
+                pass
+
+    @staticmethod
+    def settle(future, error):
+        """Complete one wait_async future, from its own event loop"""
+        if future.done():
+            return
+        if error is None:
+            future.set_result(True)
+        else:
+            future.set_exception(error)
+
+    def run(self):
+        """Write queued changes until closed"""
+        while True:
+            with self.condition:
+                while not self.pending and not self.closing:
+                    self.condition.wait()
+                if self.commit_window:
+                    deadline = time.monotonic() + self.commit_window
+                    while len(self.pending) < self.max_batch and not self.closing:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self.condition.wait(remaining)
+                if not self.pending:
+                    return
+                batch, self.pending = self.pending, []
+                last = self.submitted
+            try:
+                self.write(batch)
+            except Exception as error:
+                with self.condition:
+                    self.error = error
+                    self.settle_waiters(error)
+                    self.condition.notify_all()
+                    if self.closing:
+                        # Nobody is left to wait for a retry; hand back what was not written
+                        self.unsaved = batch + self.pending
+                        self.pending = []
+                        return
+                    # Keep the batch at the front of the queue and try again,
+                    # sooner if close() is called in the meantime
+                    self.pending[:0] = batch
+                    self.condition.wait(self.retry_delay)
+                continue
+            with self.condition:
+                self.durable = last
+                self.error = None
+                if self.waiters:
+                    self.settle_waiters()
+                self.condition.notify_all()
+
+    def close(self):
+        """
+        Write everything still queued and stop the thread.
+
+        A failing write is tried once more rather than retried forever.
+        Returns the RoomChanges that could not be written (self.error says
+        why), or an empty list.
+        """
+        with self.condition:
+            self.closing = True
+            self.condition.notify_all()
+        self.thread.join()
+        return self.unsaved
+
+
+def describe_unsaved(changes, error):
+    """Explain which changes write-behind could not save, and why"""
+    rooms = sorted({change.room_number for change in changes if change.room_number is not None})
+    lines = [f"{len(changes)} changes could not be saved: {error}"]
+    if rooms:
+        lines.append("Bookings and checkouts of rooms " + ", ".join(map(str, rooms)) + " are lost.")
+    if any(change.action == "save" for change in changes):
+        lines.append("The last full save of the inventory did not complete.")
+    return "\n".join(lines)
+
+
+class LockStripes:
+    """
+    A fixed pool of locks shared out over room numbers (lock striping).
+
+    Operations on the same room always take the same lock and so run one at
+    a time, while rooms on different stripes are handled in parallel.
+    """
+    def __init__(self, count=64):
+        self.locks = [threading.Lock() for _ in range(count)]
+
+    @contextmanager
+    def holding(self, room_numbers=None):
+        """
+        Hold the locks of the given rooms, or every lock by default.
+
+        Locks are always taken in stripe order, so callers holding several
+        rooms at once cannot deadlock each other.
+        """
+        if room_numbers is None:
+            stripes = range(len(self.locks))
+        else:
+            stripes = sorted({hash(number) % len(self.locks) for number in room_numbers})
+        held = []
+        try:
+            for stripe in stripes:
+                self.locks[stripe].acquire()
+                held.append(self.locks[stripe])
+            yield
+        finally:
+            for lock in reversed(held):
+                lock.release()
+
+
+class LatencyHistogram:
+    """
+    HDR-style latency histogram over nanoseconds.
+
+    Values below 64 ns get a bucket each; above that, every power of two is
+    split into 32 equal buckets, so any recorded value is known to within
+    about 3% while the histogram stays a few hundred buckets at most.
+    """
+    SUB_BUCKET_BITS = 5
+    SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+        self.lock = threading.Lock()
+
+    def bucket(self, value):
+        """Return the index of the bucket holding `value`"""
+        if value < 2 * self.SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - self.SUB_BUCKET_BITS - 1
+        return (shift + 1) * self.SUB_BUCKETS + (value >> shift) - self.SUB_BUCKETS
+
+    def highest_value(self, index):
+        """Return the largest value that falls into bucket `index`"""
+        if index < 2 * self.SUB_BUCKETS:
+            return index
+        shift = index // self.SUB_BUCKETS - 1
+        return ((index % self.SUB_BUCKETS + self.SUB_BUCKETS + 1) << shift) - 1
+
+    def record(self, value):
+        """Record one latency in nanoseconds"""
+        index = self.bucket(max(0, value))
+        with self.lock:
+            self.counts[index] = self.counts.get(index, 0) + 1
+            self.count += 1
+            self.total += value
+            if self.min is None or value < self.min:
+                self.min = value
+            if value > self.max:
+                self.max = value
+
+    def value_at_percentile(self, percent):
+        """Return the value that `percent` of the recorded values are at or below (to bucket precision)"""
+        if not self.count:
+            return 0
+        wanted = max(1, math.ceil(self.count * percent / 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= wanted:
+                return min(self.highest_value(index), self.max)
+        return self.max
+
+    def snapshot(self):
+        """Return the count, mean, min, percentiles and max in milliseconds, plus the non-empty buckets"""
+        with self.lock:
+            ms = 1e-6
+            return {
+                'count': self.count,
+                'mean_ms': self.total / self.count * ms if self.count else 0.0,
+                'min_ms': (self.min or 0) * ms,
+                'p50_ms': self.value_at_percentile(50) * ms,
+                'p90_ms': self.value_at_percentile(90) * ms,
+                'p99_ms': self.value_at_percentile(99) * ms,
+                'p999_ms': self.value_at_percentile(99.9) * ms,
+                'max_ms': self.max * ms,
+                'buckets': [[self.highest_value(index), self.counts[index]] for index in sorted(self.counts)],
+            }
+
+
+class Instrumentation:
+    """
+    Opt-in call counts and latency histograms for chosen methods.
+
+    wrap() replaces a method on one object with a timing wrapper, and
+    unwrap() puts the original back, so objects that are not instrumented
+    run exactly the code they always did.
+    """
+    def __init__(self):
+        self.histograms = {}
+        self.wrapped = []
+
+    def wrap(self, owner, name, label=None):
+        """Time every call of owner.<name>() into the histogram `label`"""
+        method = getattr(owner, name)
+        histogram = self.histograms.setdefault(label or name, LatencyHistogram())
+        clock = time.perf_counter_ns
+
+        if asyncio.iscoroutinefunction(method):
+            @wraps(method)
+            async def timed(*args, **kwargs):
+                started = clock()
+                try:
+                    return await method(*args, **kwargs)
+                finally:
+                    histogram.record(clock() - started)
+        else:
+            @wraps(method)
+            def timed(*args, **kwargs):
+                started = clock()
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    histogram.record(clock() - started)
+
+        setattr(owner, name, timed)
+        self.wrapped.append((owner, name))
+
+    def unwrap(self, owner):
+        """Restore the original methods of `owner`"""
+        for wrapped_owner, name in self.wrapped:
+            if wrapped_owner is owner:
+                delattr(owner, name)
+        self.wrapped = [(wrapped_owner, name) for wrapped_owner, name in self.wrapped if wrapped_owner is not owner]
+
+    def reset(self):
+        """Forget everything recorded so far"""
+        for label in self.histograms:
+            self.histograms[label] = LatencyHistogram()
+
+    def snapshot(self):
+        """Return {label: LatencyHistogram.snapshot()} for every instrumented method"""
+        return {label: histogram.snapshot() for label, histogram in sorted(self.histograms.items())}
+
+    def export_json(self):
+        """Return the snapshot as a JSON document"""
+        return json.dumps({
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'operations': self.snapshot(),
+        }, indent=2)
+
+    def export_text(self):
+        """Return the snapshot as a plain-text table"""
+        lines = [f"{'operation':<36} {'calls':>8} {'mean ms':>9} {'p50 ms':>9} {'p90 ms':>9} "
+                 f"{'p99 ms':>9} {'p99.9 ms':>9} {'max ms':>9}"]
+        for label, stats in self.snapshot().items():
+            lines.append(f"{label:<36} {stats['count']:>8} {stats['mean_ms']:>9.3f} {stats['p50_ms']:>9.3f} "
+                         f"{stats['p90_ms']:>9.3f} {stats['p99_ms']:>9.3f} {stats['p999_ms']:>9.3f} "
+                         f"{stats['max_ms']:>9.3f}")
+        return "\n".join(lines) + "\n"
+
+
+class RoomVersionConflict(Exception):
+    """
+    Raised when a room was changed after the caller read it.
+
+    book_room and check_out take the room version the caller last saw; if
+    another booking or checkout has bumped it since, nothing is changed and
+    the caller should re-read the room and try again.
+    """
+    def __init__(self, room_number, expected_version, version):
+        super().__init__(f"Room {room_number} is at version {version}, expected {expected_version}")
+        self.room_number = room_number
+        self.expected_version = expected_version
+        self.version = version
+
+
 class HotelManager:
     """
     Manages hotel rooms and their data.
+
+    Safe to share between threads. Bookings and checkouts lock only the rooms
+    they touch (see LockStripes), then briefly take `index_lock` to update the
+    shared indexes; adding, removing and reloading rooms lock everything.
+    Locks are always taken in the order room stripes, index_lock, storage_lock.
+    In shared mode the store's inter-process lock comes before all of them.
     """
-    def __init__(self):
-        """Initializes the HotelManager."""
+    def __init__(self, csv_file=None, journal=False, compact_every=500, storage=None, columnar=False,
+                 write_behind=False, fsync="batched", group_commit_window=None, group_commit_size=64,
+                 lock_stripes=64, shared=False, instrument=False):
+        """
+        Initializes the HotelManager.
+
+        Args:
+            csv_file: Path of the room snapshot. Defaults to hotel_rooms.csv next to this script.
+            journal: Append one record per booking/checkout instead of rewriting the snapshot.
+            compact_every: Number of journal records after which the journal is folded into a fresh snapshot.
+            storage: A RoomStorage to use instead of the CSV files, e.g. SqliteStorage.
+            columnar: Keep rooms in a RoomTable instead of a list of Room objects.
+            write_behind: Persist changes from a background PersistenceWorker; see wait_durable.
+            fsync: Durability policy for the CSV files: "always", "batched" or "never" (see CsvStorage).
+            group_commit_window: Seconds during which concurrent bookings and checkouts are gathered into
+                one flush. Each call still returns only once its own change is durable.
+            group_commit_size: Number of gathered changes that triggers the flush before the window ends.
+            lock_stripes: Number of locks that room numbers are spread over.
+            shared: Share the CSV files with other processes (see CsvStorage). Every change
+                first catches up with the others' changes under the store lock, then is
+                written synchronously, so write-behind and group commit are not available.
+            instrument: Time the hot-path methods from the start (see enable_instrumentation).
+        """
+        if shared and (write_behind or group_commit_window is not None):
+            raise ValueError("shared mode writes synchronously; it cannot be combined with write-behind")
         self.rooms = []
+        self.columnar = columnar
+        self.version = 0
+        self.available_cache = {}
+        self.listeners = []
+        self.room_locks = LockStripes(lock_stripes)
+        self.index_lock = threading.RLock()
+        self.storage_lock = threading.Lock()
         self.script_dir = os.path.dirname(os.path.abspath(__file__))  
-        self.csv_file = os.path.join(self.script_dir, "hotel_rooms.csv")  
+        self.csv_file = csv_file or os.path.join(self.script_dir, "hotel_rooms.csv")  
+        self.storage = storage or CsvStorage(self.csv_file, journal=journal, compact_every=compact_every, fsync=fsync,
+                                             shared=shared)
+        self.shared = shared
+        self.store_depth = 0
+        self.deferred_changes = None
+        self.instrumentation = None
+        if instrument:
+            self.enable_instrumentation()
+        self.group_commit = group_commit_window is not None
+        if write_behind or self.group_commit:
+            self.persistence = PersistenceWorker(self.write_changes, commit_window=group_commit_window or 0.0,
+                                                 max_batch=group_commit_size)
+        else:
+            self.persistence = None
         self.initialize_rooms()
 
+    # Methods timed by enable_instrumentation
+    INSTRUMENTED = ("get_available_rooms", "book_room", "check_out", "save_to_csv", "load_from_csv",
+                    "get_available_rooms_async", "book_room_async", "check_out_async")
+
+    def enable_instrumentation(self, instrumentation=None):
+        """
+        Start recording call counts and latency histograms for the hot-path methods.
+
+        Returns the Instrumentation holding them; pass one in to share it with
+        other objects, e.g. the GUI.
+        """
+        if self.instrumentation is None:
+            self.instrumentation = instrumentation or Instrumentation()
+            for name in self.INSTRUMENTED:
+                self.instrumentation.wrap(self, name, f"HotelManager.{name}")
+        return self.instrumentation
+
+    def disable_instrumentation(self):
+        """Stop timing and restore the uninstrumented methods"""
+        if self.instrumentation is not None:
+            self.instrumentation.unwrap(self)
+            self.instrumentation = None
+
     def initialize_rooms(self):
         """Initialize rooms with random AC/double bed options"""
-        if os.path.exists(self.csv_file):
-            self.load_from_csv()
-        else:
-            self.rooms = []
+        with self.storage.locked():
+            if self.storage.exists():
+                self.load_from_csv()
+                return
+            rooms = []
             for i in range(1, 46):  
-                self.rooms.append(Room(
+                rooms.append(Room(
                     room_number=i,
                     is_ac=random.choice([True, False]),
                     is_double_bed=random.choice([True, False])
                 ))
+            with self.room_locks.holding(), self.index_lock:
+                self.rooms = RoomTable(rooms) if self.columnar else rooms
+                self.rebuild_indexes()
             self.save_to_csv()
 
     def save_to_csv(self):
-        """Save all room data to CSV file"""
-        with open(self.csv_file, mode='w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow([
-                "RoomNumber", "AC", "DoubleBed", "Booked",
-                "CustomerName", "CheckInDate", "CheckOutDate"
-            ])
-            for room in self.rooms:
-                writer.writerow([
-                    room.room_number,
-                    int(room.is_ac),
-                    int(room.is_double_bed),
-                    int(room.is_booked),
-                    room.customer_name,
-                    room.check_in,
-                    room.check_out
-                ])
+        """Save all room data to the storage backend"""
+        if self.deferred_changes is not None:
+            self.deferred_changes.append(RoomChange("save"))
+            return None
+        if self.persistence is not None:
+            return self.persistence.submit(RoomChange("save"))
+        with self.shared_store(), self.consistent_rooms() as rooms:
+            self.storage.save(rooms)
 
     def load_from_csv(self):
-        """Load room data from CSV file"""
-        self.rooms = []
-        with open(self.csv_file, mode='r') as file:
-            reader = csv.reader(file)
-            next(reader)  
-            for row in reader:
-                self.rooms.append(Room(
-                    room_number=int(row[0]),
-                    is_ac=bool(int(row[1])),
-                    is_double_bed=bool(int(row[2])),
-                    is_booked=bool(int(row[3])),
-                    customer_name=row[4],
-                    check_in=row[5],
-                    check_out=row[6]
-                ))
+        """
+        Load room data from the storage backend.
+
+        Every room's version moves past the one it had before, so that
+        compare-and-set calls made against the old rooms fail.
+        """
+        if self.persistence is not None:
+            self.persistence.wait()
+        with self.storage.locked(), self.storage_lock:
+            rooms = self.storage.load()
+        self.install_rooms(rooms)
+
+    def install_rooms(self, rooms):
+        """Make `rooms` the inventory, moving each room's version past the one it replaces"""
+        with self.room_locks.holding(), self.index_lock:
+            versions = {room.room_number: room.version for room in self.rooms}
+            for room in rooms:
+                room.version = versions.get(room.room_number, -1) + 1
+            self.rooms = RoomTable(rooms) if self.columnar else rooms
+            self.rebuild_indexes()
+
+    def replace_rooms(self, rooms):
+        """Replace the whole inventory, e.g. with an imported one, and save it"""
+        with self.shared_store():
+            old_numbers = {room.room_number for room in self.rooms}
+            self.install_rooms(rooms)
+            self.save_to_csv()
+        numbers = [room.room_number for room in self.rooms]
+        self.notify_listeners(sorted(old_numbers.difference(numbers)) + numbers)
+
+    @contextmanager
+    def shared_store(self):
+        """
+        In shared mode, hold the store lock and catch up with other processes' changes first.
+
+        Every operation that reads rooms to decide on a change, and then writes
+        it, runs inside this so that it sees and extends the latest state.
+        Outside shared mode it does nothing. Nested uses catch up only once.
+        """
+        if not self.shared:
+            yield
+            return
+        with self.storage.locked():
+            # Only the thread holding the store lock gets here, so a plain counter will do
+            self.store_depth += 1
+            try:
+                if self.store_depth == 1:
+                    self.sync_with_store()
+                yield
+            finally:
+                self.store_depth -= 1
+
+    @contextmanager
+    def deferred_persistence(self):
+        """
+        Hold back every write until the block ends, then persist once.
+
+        Bookings, checkouts and saves made inside the block change the rooms
+        in memory as usual, but their RoomChanges are only collected; they
+        are written in a single record_changes call when the block exits,
+        even if it raises. In shared mode the store stays locked throughout,
+        so other processes see the whole batch at once. Nested blocks join
+        the outermost one.
+        """
+        with self.shared_store():
+            if self.deferred_changes is not None:
+                yield
+                return
+            self.deferred_changes = pending = []
+            try:
+                yield
+            finally:
+                self.deferred_changes = None
+                if pending:
+                    self.finish_commit(self.record_changes(pending))
+
+    def refresh(self):
+        """Pick up the changes other processes have made to a shared store"""
+        with self.shared_store():
+            pass
+
+    def sync_with_store(self):
+        """Apply the changes other processes have made since this one last read or wrote the store"""
+        with self.storage_lock:
+            changes = self.storage.read_external_changes()
+        if changes is None:
+            old_numbers = {room.room_number for room in self.rooms}
+            self.load_from_csv()
+            numbers = [room.room_number for room in self.rooms]
+            # Rows of rooms that are gone first, then the rest in slot order
+            changed = sorted(old_numbers.difference(numbers)) + numbers
+        else:
+            changed = []
+            with self.room_locks.holding():
+                for change in changes:
+                    slot = self.room_index.get(change.room_number)
+                    if slot is None:
+                        continue
+                    room = self.rooms[slot]
+                    if change.action == "book":
+                        if change.reservation is not None and \
+                                self.apply_booking(slot, room, change.reservation) is not None:
+                            changed.append(change.room_number)
+                    elif change.action == "checkout":
+                        check_in = change.reservation.check_in if change.reservation is not None else None
+                        if self.apply_removal(slot, room, check_in) is not None or check_in is None:
+                            changed.append(change.room_number)
+        if changed:
+            self.notify_listeners(changed)
+
+    def rebuild_indexes(self):
+        """Rebuild the room-number and night indexes from self.rooms; call with every lock held"""
+        if isinstance(self.rooms, RoomTable):
+            numbers = self.rooms.numbers
+        else:
+            numbers = [room.room_number for room in self.rooms]
+        self.room_index = {number: slot for slot, number in enumerate(numbers)}
+        self.night_index = NightIndex(self.rooms)
+        self.version += 1
+
+    def compact(self):
+        """Fold incremental changes into a fresh snapshot"""
+        if self.deferred_changes is not None:
+            self.deferred_changes.append(RoomChange("save"))
+            return None
+        if self.persistence is not None:
+            return self.persistence.submit(RoomChange("save"))
+        with self.shared_store(), self.consistent_rooms() as rooms:
+            self.storage.compact(rooms)
+
+    def record_changes(self, changes):
+        """
+        Persist RoomChanges together, in a single write.
+
+        With write-behind on, the changes are only queued; the returned
+        sequence number can be passed to wait_durable or, once the room locks
+        are released, to finish_commit. Inside deferred_persistence the changes
+        are held back and None is returned.
+        """
+        if self.deferred_changes is not None:
+            self.deferred_changes.extend(changes)
+            return None
+        if self.persistence is not None:
+            return self.persistence.submit_many(changes)
+        self.write_changes(changes)
+
+    def write_changes(self, changes):
+        """Write RoomChanges to storage now, with a consistent copy of the rooms if it rewrites them"""
+        with self.storage_lock:
+            if not self.storage.needs_rooms(changes):
+                self.storage.record_changes(changes, None)
+                return
+        with self.consistent_rooms() as rooms:
+            self.storage.record_changes(changes, rooms)
+
+    @contextmanager
+    def consistent_rooms(self):
+        """
+        Copy every room, then hold storage_lock while the copy is written.
+
+        Rooms only change under index_lock, so the copy taken under it has no
+        half-updated rows. storage_lock is taken before index_lock is let go:
+        a change made after the copy can then only be written after it, and
+        cannot be dropped along with a journal the copy replaces. Bookings
+        carry on in memory while the copy is being written.
+        """
+        with self.index_lock:
+            rooms = self.rooms.copy() if isinstance(self.rooms, RoomTable) else [copy_room(room) for room in self.rooms]
+            self.storage_lock.acquire()
+        try:
+            yield rooms
+        finally:
+            self.storage_lock.release()
+
+    def finish_commit(self, sequence):
+        """With group commit, block until the flush carrying change `sequence` has completed"""
+        if self.group_commit and sequence is not None:
+            self.persistence.wait(sequence)
+
+    def wait_durable(self, sequence=None, timeout=None):
+        """
+        Block until queued changes are on disk (all of them by default).
+
+        Returns immediately when write-behind is off, as every change is then
+        written before the call that made it returns.
+        """
+        if self.persistence is None:
+            return True
+        return self.persistence.wait(sequence, timeout)
+
+    def close(self):
+        """
+        Flush pending writes and release the storage backend.
+
+        Returns the RoomChanges write-behind could not save, or an empty list.
+        """
+        unsaved = self.persistence.close() if self.persistence is not None else []
+        self.storage.close()
+        return unsaved
 
     def get_all_rooms(self):
         """Return all rooms"""
         return self.rooms
 
-    def get_available_rooms(self, want_ac=None, want_double_bed=None):
-        """Filter available rooms by optional criteria"""
-        available = []
-        for room in self.rooms:
-            if not room.is_booked:
-                if (want_ac is None or room.is_ac == want_ac) and \
-                        (want_double_bed is None or room.is_double_bed == want_double_bed):
-                    available.append(room)
-        return available
-
-    def book_room(self, room_number, customer_name, check_in, check_out):
-        """Book a specific room"""
-        if 1 <= room_number <= len(self.rooms):
-            room = self.rooms[room_number - 1]
-            if not room.is_booked:
-                room.is_booked = True
-                room.customer_name = customer_name
-                room.check_in = check_in
-                room.check_out = check_out
-                self.save_to_csv()
-                return True
-        return False
+    def add_listener(self, callback):
+        """Register a callback(room_numbers) run after rooms are booked, checked out, added or removed"""
+        self.listeners.append(callback)
+
+    def notify_listeners(self, room_numbers):
+        """Tell every listener which rooms changed"""
+        for callback in self.listeners:
+            callback(room_numbers)
+
+    def find_room(self, room_number):
+        """Return the room with the given number, or None"""
+        with self.index_lock:
+            slot = self.room_index.get(room_number)
+            return None if slot is None else self.rooms[slot]
+
+    def add_room(self, room):
+        """Add a room to the inventory; returns False if its number is already taken"""
+        with self.shared_store(), self.room_locks.holding():
+            with self.index_lock:
+                if room.room_number in self.room_index:
+                    return False
+                self.room_index[room.room_number] = len(self.rooms)
+                self.rooms.append(room)
+                self.night_index.append(room)
+                self.version += 1
+            self.save_to_csv()
+        self.notify_listeners([room.room_number])
+        return True
+
+    def remove_room(self, room_number):
+        """
+        Remove a room from the inventory, keeping the order of the others.
+
+        Returns False if there is no such room or it still holds a reservation.
+        """
+        with self.shared_store(), self.room_locks.holding():
+            with self.index_lock:
+                slot = self.room_index.get(room_number)
+                if slot is None or self.rooms[slot].is_booked:
+                    return False
+                del self.rooms[slot]
+                del self.room_index[room_number]
+                for later in range(slot, len(self.rooms)):
+                    self.room_index[self.rooms[later].room_number] = later
+                self.night_index.delete(slot)
+                self.version += 1
+            self.save_to_csv()
+        self.notify_listeners([room_number])
+        return True
+
+    def get_available_rooms(self, want_ac=None, want_double_bed=None, check_in=None, check_out=None):
+        """
+        Filter available rooms by optional criteria.
+
+        Without dates, only rooms holding no reservation at all count as
+        available; those results are cached per filter (see
+        available_slots). Given check_in and check_out (DD/MM/YYYY), every
+        room with no stay overlapping that window is returned instead,
+        answered from the night index.
+
+        Raises:
+            ValueError: If only one date is given, a date is not DD/MM/YYYY,
+                or check-out is not 1 to MAX_STAY_NIGHTS nights after check-in.
+        """
+        if bool(check_in) != bool(check_out):
+            raise ValueError("check_in and check_out must be given together")
+        with self.index_lock:
+            if check_in and check_out:
+                mask = self.night_index.free_mask(parse_day(check_in), parse_day(check_out), want_ac, want_double_bed)
+                return self.rooms_at(iter_set_bits(mask))
+            return self.rooms_at(self.available_slots(want_ac, want_double_bed))
+
+    async def get_available_rooms_async(self, want_ac=None, want_double_bed=None, check_in=None, check_out=None):
+        """
+        Asyncio variant of get_available_rooms.
+
+        Queries answered from memory run inline, as they are quick; those the
+        storage backend answers from disk run on the default executor.
+        """
+        if self.queries_storage() and not (check_in and check_out):
+            return await asyncio.get_running_loop().run_in_executor(
+                None, self.get_available_rooms, want_ac, want_double_bed, check_in, check_out)
+        return self.get_available_rooms(want_ac, want_double_bed, check_in, check_out)
+
+    def available_slots(self, want_ac=None, want_double_bed=None):
+        """
+        Return the sorted slots of free rooms matching a filter.
+
+        Results are cached per (want_ac, want_double_bed) and tagged with the
+        inventory version they were computed at. Bookings and checkouts patch
+        the cached slots in place (see note_change); anything else that bumps
+        the version makes them recompute on next use. The list is shared with
+        the cache, so other threads should read it while holding index_lock.
+        """
+        with self.index_lock:
+            key = (want_ac, want_double_bed)
+            entry = self.available_cache.get(key)
+            if entry is not None and entry[0] == self.version:
+                return entry[1]
+            if isinstance(self.rooms, RoomTable):
+                slots = list(iter_set_bits(self.rooms.available_mask(want_ac, want_double_bed)))
+            else:
+                numbers = None
+                if self.queries_storage():
+                    with self.storage_lock:
+                        numbers = self.storage.available_room_numbers(want_ac, want_double_bed)
+                if numbers is not None:
+                    slots = sorted(self.room_index[number] for number in numbers)
+                else:
+                    slots = [slot for slot, room in enumerate(self.rooms)
+                             if not room.is_booked and
+                             (want_ac is None or room.is_ac == want_ac) and
+                             (want_double_bed is None or room.is_double_bed == want_double_bed)]
+            self.available_cache[key] = [self.version, slots]
+            return slots
+
+    def count_available(self, want_ac=None, want_double_bed=None):
+        """
+        Count the free rooms matching a filter without building them.
+
+        A RoomTable answers with a single popcount over its bitsets; a list
+        of rooms counts the cached slots of available_slots.
+        """
+        with self.index_lock:
+            if isinstance(self.rooms, RoomTable):
+                return self.rooms.count_available(want_ac, want_double_bed)
+            return len(self.available_slots(want_ac, want_double_bed))
+
+    def queries_storage(self):
+        """
+        Return True if availability can be asked of the storage backend.
+
+        Only a backend that answers from disk qualifies, and only while every
+        change is written before the call that made it returns; with
+        write-behind, or inside deferred_persistence, the rooms in memory are
+        ahead of the store.
+        """
+        return (self.storage.queries_on_disk and self.persistence is None and self.deferred_changes is None and
+                not isinstance(self.rooms, RoomTable))
+
+    def rooms_at(self, slots):
+        """Return the rooms in the given slots as a new list"""
+        if isinstance(self.rooms, RoomTable):
+            return self.rooms.views_at(slots)
+        rooms = self.rooms
+        return [rooms[slot] for slot in slots]
+
+    def note_change(self, slot, room, was_booked):
+        """Bump the inventory version after a booking or checkout, patching cached availability; call with index_lock held"""
+        self.version += 1
+        for (want_ac, want_double_bed), entry in self.available_cache.items():
+            if entry[0] != self.version - 1:
+                continue
+            entry[0] = self.version
+            if room.is_booked == was_booked:
+                continue
+            if (want_ac is None or room.is_ac == want_ac) and \
+                    (want_double_bed is None or room.is_double_bed == want_double_bed):
+                slots = entry[1]
+                if room.is_booked:
+                    del slots[bisect_left(slots, slot)]
+                else:
+                    insort(slots, slot)
+
+    def book_room(self, room_number, customer_name, check_in, check_out, expected_version=None):
+        """
+        Book a specific room for a stay that does not overlap its existing reservations.
+
+        If expected_version is given, the booking is only made while the room
+        is still at that version (compare-and-set).
+
+        Raises:
+            RoomVersionConflict: The room has changed since expected_version was read.
+        """
+        booked, sequence = self.make_booking(room_number, customer_name, check_in, check_out, expected_version)
+        if booked:
+            self.finish_commit(sequence)
+            self.notify_listeners([room_number])
+        return booked
+
+    async def book_room_async(self, room_number, customer_name, check_in, check_out, expected_version=None):
+        """
+        Asyncio variant of book_room that returns once the booking is on disk.
+
+        With write-behind, the booking is made right away and the coroutine
+        then awaits the persistence worker without holding a thread. Otherwise
+        the whole call runs on the event loop's default executor.
+        """
+        if self.persistence is None:
+            return await asyncio.get_running_loop().run_in_executor(
+                None, self.book_room, room_number, customer_name, check_in, check_out, expected_version)
+        booked, sequence = self.make_booking(room_number, customer_name, check_in, check_out, expected_version)
+        if booked:
+            await self.persistence.wait_async(sequence)
+            self.notify_listeners([room_number])
+        return booked
+
+    def make_booking(self, room_number, customer_name, check_in, check_out, expected_version=None):
+        """Book a room and queue or write the change; returns (booked, sequence) without waiting for group commit"""
+        if not valid_customer_name(customer_name):
+            return False, None
+        try:
+            reservation = Reservation.for_booking(customer_name, check_in, check_out)
+        except ValueError:
+            return False, None
+        with self.shared_store(), self.room_locks.holding([room_number]):
+            slot = self.room_index.get(room_number)
+            if slot is None:
+                return False, None
+            self.check_version(self.rooms[slot], expected_version)
+            change = self.apply_booking(slot, self.rooms[slot], reservation)
+            if change is None:
+                return False, None
+            return True, self.record_changes([change])
+
+    def book_rooms(self, requests):
+        """
+        Book several rooms at once, e.g. for a group reservation.
+
+        Every request is validated first. The bookings are applied only if all
+        of them can be, and are then persisted in one write.
+
+        Args:
+            requests: Iterable of (room_number, customer_name, check_in, check_out).
+
+        Returns:
+            One dict per request with 'room_number', 'success' and 'error'.
+        """
+        requests = list(requests)
+        with self.shared_store(), self.room_locks.holding([request[0] for request in requests]):
+            results, changes = self.book_locked_rooms(requests)
+            sequence = self.record_changes(changes) if changes else None
+        self.finish_commit(sequence)
+        if changes:
+            self.notify_listeners([result['room_number'] for result in results])
+        return results
+
+    def book_locked_rooms(self, requests):
+        """Validate and apply book_rooms requests whose rooms are locked; returns (results, RoomChanges)"""
+        results = []
+        planned = []
+        planned_stays = {}
+        for room_number, customer_name, check_in, check_out in requests:
+            error = None
+            slot = self.room_index.get(room_number)
+            if slot is None:
+                error = "No such room"
+            elif not valid_customer_name(customer_name):
+                error = "Customer name must not contain line breaks or other control characters"
+            else:
+                room = self.rooms[slot]
+                try:
+                    reservation = Reservation.for_booking(customer_name, check_in, check_out)
+                except ValueError:
+                    error = f"Dates must be DD/MM/YYYY with check-out 1 to {MAX_STAY_NIGHTS} nights after check-in"
+                else:
+                    stays = planned_stays.setdefault(slot, RoomCalendar())
+                    if room.reservations is None and room.is_booked:
+                        error = "Room is already booked"
+                    elif (room.reservations is not None and
+                          not room.reservations.is_free(reservation.start, reservation.end)) or \
+                            not stays.add(reservation):
+                        error = "Room is already booked for those dates"
+                    else:
+                        planned.append((slot, room, reservation))
+            results.append({'room_number': room_number, 'success': error is None, 'error': error})
+
+        if len(planned) < len(results):
+            for result in results:
+                if result['success']:
+                    result['success'] = False
+                    result['error'] = "Not booked because another request in the batch failed"
+            return results, []
+
+        return results, [self.apply_booking(slot, room, reservation) for slot, room, reservation in planned]
+
+    @staticmethod
+    def check_version(room, expected_version):
+        """Raise RoomVersionConflict unless the room is at expected_version (None skips the check)"""
+        if expected_version is not None and room.version != expected_version:
+            raise RoomVersionConflict(room.room_number, expected_version, room.version)
+
+    def apply_booking(self, slot, room, reservation):
+        """
+        Add a reservation to a room and update the indexes; returns the RoomChange, or None on overlap.
+
+        The caller must hold the room's lock. index_lock is taken as well
+        because columnar rooms share bitset bytes with their neighbours.
+        """
+        with self.index_lock:
+            was_booked = room.is_booked
+            if not add_reservation(room, reservation):
+                return None
+            room.version += 1
+            self.night_index.add(slot, reservation)
+            self.note_change(slot, room, was_booked)
+        return RoomChange("book", room.room_number, room.is_booked, reservation)
+
+    def check_out(self, room_number, expected_version=None):
+        """
+        Check the current guest out of a room and return booking info.
 
-    def check_out(self, room_number):
-        """Check out from a room and return booking info"""
-        if 1 <= room_number <= len(self.rooms):
-            room = self.rooms[room_number - 1]
-            if room.is_booked:
-                booking_info = {
-                    'room_number': room.room_number,
-                    'customer': room.customer_name,
-                    'period': f"{room.check_in} to {room.check_out}"
-                }
-                room.is_booked = False
-                room.customer_name = ""
-                room.check_in = ""
-                room.check_out = ""
-                self.save_to_csv()
-                return (True, booking_info)
-        return (False, None)
+        If expected_version is given, the checkout only happens while the room
+        is still at that version, so a stale view cannot check out a guest who
+        arrived after it was read.
+
+        Raises:
+            RoomVersionConflict: The room has changed since expected_version was read.
+        """
+        booking_info, sequence = self.make_checkout(room_number, expected_version)
+        if booking_info is None:
+            return (False, None)
+        self.finish_commit(sequence)
+        self.notify_listeners([room_number])
+        return (True, booking_info)
+
+    async def check_out_async(self, room_number, expected_version=None):
+        """Asyncio variant of check_out that returns once the checkout is on disk (see book_room_async)"""
+        if self.persistence is None:
+            return await asyncio.get_running_loop().run_in_executor(
+                None, self.check_out, room_number, expected_version)
+        booking_info, sequence = self.make_checkout(room_number, expected_version)
+        if booking_info is None:
+            return (False, None)
+        await self.persistence.wait_async(sequence)
+        self.notify_listeners([room_number])
+        return (True, booking_info)
+
+    def make_checkout(self, room_number, expected_version=None):
+        """Check a room out and queue or write the change; returns (booking_info or None, sequence)"""
+        with self.shared_store(), self.room_locks.holding([room_number]):
+            slot = self.room_index.get(room_number)
+            if slot is None:
+                return None, None
+            self.check_version(self.rooms[slot], expected_version)
+            if not self.rooms[slot].is_booked:
+                return None, None
+            booking_info, change = self.apply_checkout(slot, self.rooms[slot])
+            return booking_info, self.record_changes([change])
+
+    def check_out_many(self, room_numbers):
+        """
+        Check the current guests out of several rooms at once.
+
+        Every room is validated first. The checkouts are applied only if all
+        of them can be, and are then persisted in one write.
+
+        Returns:
+            One dict per room with 'room_number', 'success' and 'error', plus
+            the check_out booking info ('customer', 'period', 'nights') on success.
+        """
+        room_numbers = list(room_numbers)
+        with self.shared_store(), self.room_locks.holding(room_numbers):
+            results, changes = self.check_out_locked_rooms(room_numbers)
+            sequence = self.record_changes(changes) if changes else None
+        self.finish_commit(sequence)
+        if changes:
+            self.notify_listeners(room_numbers)
+        return results
+
+    def check_out_locked_rooms(self, room_numbers):
+        """Validate and apply check_out_many for rooms that are locked; returns (results, RoomChanges)"""
+        results = []
+        seen = set()
+        for room_number in room_numbers:
+            slot = self.room_index.get(room_number)
+            if slot is None:
+                error = "No such room"
+            elif room_number in seen:
+                error = "Room listed more than once"
+            elif not self.rooms[slot].is_booked:
+                error = "Room is not booked"
+            else:
+                error = None
+            seen.add(room_number)
+            results.append({'room_number': room_number, 'success': error is None, 'error': error})
+
+        if not all(result['success'] for result in results):
+            for result in results:
+                if result['success']:
+                    result['success'] = False
+                    result['error'] = "Not checked out because another room in the batch failed"
+            return results, []
+
+        changes = []
+        for result in results:
+            slot = self.room_index[result['room_number']]
+            booking_info, change = self.apply_checkout(slot, self.rooms[slot])
+            result.update(booking_info)
+            changes.append(change)
+        return results, changes
+
+    def apply_checkout(self, slot, room):
+        """
+        End the current stay in a booked room and update the indexes; returns (booking_info, RoomChange).
+
+        The caller must hold the room's lock.
+        """
+        booking_info = {
+            'room_number': room.room_number,
+            'customer': room.customer_name,
+            'period': f"{room.check_in} to {room.check_out}"
+        }
+        reservation = self.apply_removal(slot, room)
+        booking_info['nights'] = reservation.nights if reservation is not None else None
+        return booking_info, RoomChange("checkout", room.room_number, room.is_booked, reservation)
+
+    def apply_removal(self, slot, room, check_in=None):
+        """
+        Remove the reservation checking in on `check_in` (the current one by
+        default) and update the indexes; returns it, or None if there was none.
+
+        The caller must hold the room's lock.
+        """
+        with self.index_lock:
+            was_booked = room.is_booked
+            reservation = remove_reservation(room, check_in)
+            if reservation is not None or room.is_booked != was_booked:
+                room.version += 1
+                self.night_index.remove(slot, reservation)
+                self.note_change(slot, room, was_booked)
+        return reservation
 
 class HotelGUI:
     """
     Graphical User Interface for the Hotel Management System.
     """
-    def __init__(self, root):
+    # Views with more rows than this only materialize the rows in sight
+    VIRTUAL_THRESHOLD = 5000
+    # Rows kept materialized above and below the visible ones in a virtual view
+    VIRTUAL_OVERSCAN = 50
+    # How often a shared store is checked for other terminals' changes, in ms
+    SHARED_POLL_MS = 2000
+
+    def __init__(self, root, shared=False, instrument=False, columnar=False):
         """
         Initializes the HotelGUI.
+
+        With shared=True, several terminals can run against the same files;
+        changes made elsewhere show up within SHARED_POLL_MS. With
+        instrument=True, HotelManager and the table refreshes are timed and
+        self.hotel.instrumentation holds the results. With columnar=True the
+        rooms are kept in a RoomTable, which suits very large inventories.
         """
         self.root = root
         self.root.title("Hotel Management System")
         self.root.geometry("900x600")
 
-        self.hotel = HotelManager()
+        self.hotel = HotelManager(journal=True, write_behind=not shared, shared=shared, columnar=columnar,
+                                  instrument=instrument)
+        if instrument:
+            # Wrapped before create_widgets so that the buttons call the timed methods
+            for name in ("show_all_rooms", "clear_tree"):
+                self.hotel.instrumentation.wrap(self, name, f"HotelGUI.{name}")
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.hotel.add_listener(self.on_rooms_changed)
+        if shared:
+            self.root.after(self.SHARED_POLL_MS, self.poll_shared_store)
+
+        # Rows on display: what kind of view, and room number -> Treeview item
+        self.view_mode = None
+        self.view_filter = (None, None)
+        self.tree_items = {}
+
+        # Virtual view state: first row in sight, rows in sight, and the
+        # [start, stop) range of rows currently materialized in the tree
+        self.virtual = False
+        self.virtual_first = 0
+        self.visible_rows = 25
+        self.virtual_window = (0, 0)
+        # Room numbers selected in a virtual view; its rows are reused for other rooms
+        self.virtual_selection = set()
 
         self.create_widgets()
 
@@ -179,11 +2443,25 @@ class HotelGUI:
         ttk.Button(button_frame, text="Available Rooms", command=self.show_available_rooms).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Book Room", command=self.book_room).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Check Out", command=self.check_out).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Book Selected", command=self.book_selected).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Check Out Selected", command=self.check_out_selected).pack(side=tk.LEFT, padx=5)
 
         
-        self.tree = ttk.Treeview(self.main_frame, columns=('Room', 'AC', 'Bed', 'Status', 'Customer', 'Period'),
-                                 show='headings')
-        self.tree.pack(fill=tk.BOTH, expand=True)
+        tree_frame = ttk.Frame(self.main_frame)
+        tree_frame.pack(fill=tk.BOTH, expand=True)
+
+        self.tree = ttk.Treeview(tree_frame, columns=('Room', 'AC', 'Bed', 'Status', 'Customer', 'Period'),
+                                 show='headings', selectmode='extended')
+        self.scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self.scrollbar.set)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.tree.bind('<Configure>', self.on_tree_resized)
+        self.tree.bind('<<TreeviewSelect>>', self.on_tree_select)
+        self.tree.bind('<MouseWheel>', self.on_mouse_wheel)
+        self.tree.bind('<Button-4>', self.on_mouse_wheel)
+        self.tree.bind('<Button-5>', self.on_mouse_wheel)
 
         
         self.tree.heading('Room', text='Room No.')
@@ -209,22 +2487,74 @@ class HotelGUI:
         self.show_all_rooms()
 
     def show_all_rooms(self):
-        """Display all rooms in the treeview"""
-        self.clear_tree()
-        for room in self.hotel.get_all_rooms():
-            status = "Booked" if room.is_booked else "Available"
-            customer = room.customer_name if room.is_booked else ""
-            period = f"{room.check_in} to {room.check_out}" if room.is_booked else ""
-
-            self.tree.insert('', tk.END, values=(
-                room.room_number,
-                "Yes" if room.is_ac else "No",
-                "Double" if room.is_double_bed else "Single",
-                status,
-                customer,
-                period
-            ))
-        self.status_var.set(f"Displaying all {len(self.hotel.get_all_rooms())} rooms")
+        """Display all rooms in the treeview, rebuilding it only if another view was showing"""
+        if self.view_mode != "all":
+            self.clear_tree()
+            self.view_mode = "all"
+            if len(self.hotel.get_all_rooms()) > self.VIRTUAL_THRESHOLD:
+                self.start_virtual_view()
+            else:
+                for room in self.hotel.get_all_rooms():
+                    self.tree_items[room.room_number] = self.tree.insert('', tk.END, values=self.room_values(room))
+        self.show_room_counts()
+
+    def show_room_counts(self):
+        """Show how many rooms there are, and how many are free, in the status bar"""
+        self.status_var.set(f"Displaying all {len(self.hotel.get_all_rooms())} rooms, "
+                            f"{self.hotel.count_available()} available")
+
+    @staticmethod
+    def room_values(room):
+        """Return the Treeview row values for a room; the command-line tools print the same columns"""
+        status = "Booked" if room.is_booked else "Available"
+        customer = room.customer_name if room.is_booked else ""
+        period = f"{room.check_in} to {room.check_out}" if room.is_booked else ""
+        if room.reservations is not None and len(room.reservations) > 1:
+            period += f" (+{len(room.reservations) - 1} more)"
+        return (
+            room.room_number,
+            "Yes" if room.is_ac else "No",
+            "Double" if room.is_double_bed else "Single",
+            status,
+            customer,
+            period
+        )
+
+    def shows_room(self, room):
+        """Return True if the current view should have a row for the room"""
+        if self.view_mode == "all":
+            return True
+        want_ac, want_bed = self.view_filter
+        return (not room.is_booked and
+                (want_ac is None or room.is_ac == want_ac) and
+                (want_bed is None or room.is_double_bed == want_bed))
+
+    def on_rooms_changed(self, room_numbers):
+        """Patch only the rows of the rooms the HotelManager reports as changed"""
+        if self.view_mode is None:
+            return
+        if self.view_mode == "all":
+            self.show_room_counts()
+        if self.virtual:
+            self.render_virtual_window(self.virtual_first, force=True)
+            return
+        for number in room_numbers:
+            room = self.hotel.find_room(number)
+            item = self.tree_items.get(number)
+            if room is None or not self.shows_room(room):
+                if item is not None:
+                    self.tree.delete(item)
+                    del self.tree_items[number]
+            elif item is not None:
+                self.tree.item(item, values=self.room_values(room))
+            else:
+                # Rows are kept in slot order, so a room's slot tells where its row goes
+                slot = self.hotel.room_index[number]
+                if self.view_mode == "all":
+                    position = slot
+                else:
+                    position = bisect_left(self.hotel.available_slots(*self.view_filter), slot)
+                self.tree_items[number] = self.tree.insert('', position, values=self.room_values(room))
 
     def show_available_rooms(self):
         """Show available rooms filtering dialog"""
@@ -247,20 +2577,18 @@ class HotelGUI:
             want_ac = None if ac_var.get() == "Any" else (ac_var.get() == "Yes")
             want_bed = None if bed_var.get() == "Any" else (bed_var.get() == "Yes")
 
-            available = self.hotel.get_available_rooms(want_ac, want_bed)
             self.clear_tree()
+            self.view_mode = "available"
+            self.view_filter = (want_ac, want_bed)
 
-            for room in available:
-                self.tree.insert('', tk.END, values=(
-                    room.room_number,
-                    "Yes" if room.is_ac else "No",
-                    "Double" if room.is_double_bed else "Single",
-                    "Available",
-                    "",
-                    ""
-                ))
+            slots = self.hotel.available_slots(want_ac, want_bed)
+            if len(slots) > self.VIRTUAL_THRESHOLD:
+                self.start_virtual_view()
+            else:
+                for room in self.hotel.rooms_at(slots):
+                    self.tree_items[room.room_number] = self.tree.insert('', tk.END, values=self.room_values(room))
 
-            self.status_var.set(f"Found {len(available)} available rooms matching your criteria")
+            self.status_var.set(f"Found {len(slots)} available rooms matching your criteria")
             dialog.destroy()
 
         ttk.Button(dialog, text="Apply Filter", command=apply_filter).grid(row=2, column=0, columnspan=2, pady=10)
@@ -282,77 +2610,112 @@ class HotelGUI:
                                                                                              pady=5)
         bed_var.set("Yes")
 
-        ttk.Button(dialog, text="Find Available Rooms",
-                  command=lambda: self.show_available_for_booking(dialog, ac_var.get() == "Yes",
-                                                                bed_var.get() == "Yes")) \
-            .grid(row=2, column=0, columnspan=2, pady=10)
+        ttk.Label(dialog, text="Check-in Date:").grid(row=2, column=0, padx=5, pady=5, sticky=tk.W)
+        checkin_entry = ttk.Entry(dialog)  
+        checkin_entry.grid(row=2, column=1, padx=5, pady=5)
+        checkin_cal_button = ttk.Button(dialog, text="Select Date", command=lambda: self.show_calendar(dialog, checkin_entry))
+        checkin_cal_button.grid(row=2, column=2, padx=5, pady=5)
+
+
+        ttk.Label(dialog, text="Check-out Date:").grid(row=3, column=0, padx=5, pady=5, sticky=tk.W)
+        checkout_entry = ttk.Entry(dialog) 
+        checkout_entry.grid(row=3, column=1, padx=5, pady=5)
+        checkout_cal_button = ttk.Button(dialog, text="Select Date", command=lambda: self.show_calendar(dialog, checkout_entry))
+        checkout_cal_button.grid(row=3, column=2, padx=5, pady=5)
+
+        def find_rooms():
+            check_in = checkin_entry.get()
+            check_out = checkout_entry.get()
 
-    def show_available_for_booking(self, parent_dialog, want_ac, want_double_bed):
-        """Show available rooms for booking"""
-        available = self.hotel.get_available_rooms(want_ac, want_double_bed)
+            if not check_in or not check_out:
+                messagebox.showerror("Error", "Both dates are required!")
+                return
+
+            
+            try:
+                if parse_day(check_out) <= parse_day(check_in):
+                    messagebox.showerror("Error", "Check-out date must be after the check-in date.")
+                    return
+            except ValueError:
+                messagebox.showerror("Error", "Invalid date format. Please use DD/MM/YYYY")
+                return
+
+            self.show_available_for_booking(dialog, ac_var.get() == "Yes", bed_var.get() == "Yes", check_in, check_out)
+
+        ttk.Button(dialog, text="Find Available Rooms", command=find_rooms) \
+            .grid(row=4, column=0, columnspan=3, pady=10)
+
+    def show_available_for_booking(self, parent_dialog, want_ac, want_double_bed, check_in, check_out):
+        """Show rooms available for the requested stay"""
+        available = self.hotel.get_available_rooms(want_ac, want_double_bed, check_in, check_out)
         parent_dialog.destroy()
 
         if not available:
-            messagebox.showinfo("No Rooms", "No matching rooms available.")
+            messagebox.showinfo("No Rooms", "No matching rooms available for those dates.")
             return
 
         dialog = tk.Toplevel(self.root)
         dialog.title("Book Available Room")
 
+        # Versions of the rooms as listed, so a room booked meanwhile is caught on confirm
+        versions = {r.room_number: r.version for r in available}
+
         ttk.Label(dialog, text="Available Rooms:").grid(row=0, column=0, padx=5, pady=5, sticky=tk.W)
         room_var = tk.StringVar()
-        ttk.Combobox(dialog, textvariable=room_var,
-                         values=[str(r.room_number) for r in available], state="readonly").grid(row=0, column=1, padx=5,
-                                                                                            pady=5)
+        room_box = ttk.Combobox(dialog, textvariable=room_var,
+                                values=[str(r.room_number) for r in available], state="readonly")
+        room_box.grid(row=0, column=1, padx=5, pady=5)
         room_var.set(str(available[0].room_number))
 
         ttk.Label(dialog, text="Customer Name:").grid(row=1, column=0, padx=5, pady=5, sticky=tk.W)
         name_entry = ttk.Entry(dialog)
         name_entry.grid(row=1, column=1, padx=5, pady=5)
 
-        ttk.Label(dialog, text="Check-in Date:").grid(row=2, column=0, padx=5, pady=5, sticky=tk.W)
-        checkin_entry = ttk.Entry(dialog)  
-        checkin_entry.grid(row=2, column=1, padx=5, pady=5)
-        checkin_cal_button = ttk.Button(dialog, text="Select Date", command=lambda: self.show_calendar(dialog, checkin_entry))
-        checkin_cal_button.grid(row=2, column=2, padx=5, pady=5)
+        ttk.Label(dialog, text="Stay:").grid(row=2, column=0, padx=5, pady=5, sticky=tk.W)
+        ttk.Label(dialog, text=f"{check_in} to {check_out}").grid(row=2, column=1, padx=5, pady=5, sticky=tk.W)
 
 
-        ttk.Label(dialog, text="Check-out Date:").grid(row=3, column=0, padx=5, pady=5, sticky=tk.W)
-        checkout_entry = ttk.Entry(dialog) 
-        checkout_entry.grid(row=3, column=1, padx=5, pady=5)
-        checkout_cal_button = ttk.Button(dialog, text="Select Date", command=lambda: self.show_calendar(dialog, checkout_entry))
-        checkout_cal_button.grid(row=3, column=2, padx=5, pady=5)
-
+        def refresh_rooms():
+            current = self.hotel.get_available_rooms(want_ac, want_double_bed, check_in, check_out)
+            if not current:
+                messagebox.showinfo("No Rooms", "No matching rooms are available for those dates any more.")
+                dialog.destroy()
+                return
+            versions.clear()
+            versions.update((r.room_number, r.version) for r in current)
+            room_box['values'] = [str(r.room_number) for r in current]
+            if room_var.get() not in room_box['values']:
+                room_var.set(str(current[0].room_number))
 
         def confirm_booking():
             try:
                 room_num = int(room_var.get())
                 customer = name_entry.get()
-                check_in = checkin_entry.get()
-                check_out = checkout_entry.get()
 
-                if not customer or not check_in or not check_out:
+                if not customer:
                     messagebox.showerror("Error", "All fields are required!")
                     return
 
-                
                 try:
-                    datetime.strptime(check_in, "%d/%m/%Y")
-                    datetime.strptime(check_out, "%d/%m/%Y")
-                except ValueError:
-                    messagebox.showerror("Error", "Invalid date format. Please use DD/MM/YYYY")
+                    booked = self.hotel.book_room(room_num, customer, check_in, check_out,
+                                                  expected_version=versions.get(room_num))
+                except RoomVersionConflict:
+                    messagebox.showwarning("Room Changed", f"Room {room_num} was changed while this dialog was open.\n"
+                                                           "The list of rooms has been refreshed, please confirm again.")
+                    refresh_rooms()
                     return
 
-                if self.hotel.book_room(room_num, customer, check_in, check_out):
-                    messagebox.showinfo("Success", f"Room {room_num} booked successfully!")
+                if booked:
+                    if self.confirm_saved():
+                        messagebox.showinfo("Success", f"Room {room_num} booked successfully!")
                     self.show_all_rooms()
                     dialog.destroy()
                 else:
-                    messagebox.showerror("Error", "Booking failed. Room may be already booked.")
+                    messagebox.showerror("Error", "Booking failed. Room may be already booked for those dates.")
             except ValueError:
                 messagebox.showerror("Error", "Please enter valid information!")
 
-        ttk.Button(dialog, text="Confirm Booking", command=confirm_booking).grid(row=4, column=0, columnspan=3, pady=10)
+        ttk.Button(dialog, text="Confirm Booking", command=confirm_booking).grid(row=3, column=0, columnspan=2, pady=10)
 
     def show_calendar(self, parent, entry_widget):
         """
@@ -362,6 +2725,9 @@ class HotelGUI:
             parent: The parent window.
             entry_widget: The Entry widget to update with the selected date.
         """
+        # Imported here so the command-line tools run where tkcalendar is not installed
+        from tkcalendar import Calendar
+
         cal_dialog = tk.Toplevel(parent)
         cal_dialog.title("Select Date")
         cal = Calendar(cal_dialog, selectmode='day', date_pattern='dd/mm/yyyy')
@@ -386,22 +2752,47 @@ class HotelGUI:
         dialog = tk.Toplevel(self.root)
         dialog.title("Check Out")
 
+        # Versions of the rooms as listed, so a guest change meanwhile is caught on confirm
+        versions = {r.room_number: r.version for r in booked_rooms}
+
         ttk.Label(dialog, text="Select Room:").grid(row=0, column=0, padx=5, pady=5, sticky=tk.W)
         room_var = tk.StringVar()
-        ttk.Combobox(dialog, textvariable=room_var,
-                         values=[f"{r.room_number} - {r.customer_name}" for r in booked_rooms],
-                         state="readonly").grid(row=0, column=1, padx=5, pady=5)
+        room_box = ttk.Combobox(dialog, textvariable=room_var,
+                                values=[f"{r.room_number} - {r.customer_name}" for r in booked_rooms],
+                                state="readonly")
+        room_box.grid(row=0, column=1, padx=5, pady=5)
         room_var.set(f"{booked_rooms[0].room_number} - {booked_rooms[0].customer_name}")
 
+        def refresh_rooms():
+            current = [r for r in self.hotel.get_all_rooms() if r.is_booked]
+            if not current:
+                messagebox.showinfo("No Bookings", "There are no booked rooms to check out any more.")
+                dialog.destroy()
+                return
+            versions.clear()
+            versions.update((r.room_number, r.version) for r in current)
+            room_box['values'] = [f"{r.room_number} - {r.customer_name}" for r in current]
+            if room_var.get() not in room_box['values']:
+                room_var.set(room_box['values'][0])
+
         def confirm_checkout():
             room_num = int(room_var.get().split()[0])
-            success, booking_info = self.hotel.check_out(room_num)
+            try:
+                success, booking_info = self.hotel.check_out(room_num, expected_version=versions.get(room_num))
+            except RoomVersionConflict:
+                messagebox.showwarning("Room Changed", f"Room {room_num} was changed while this dialog was open.\n"
+                                                       "The list of rooms has been refreshed, please confirm again.")
+                refresh_rooms()
+                return
 
             if success:
                 message = f"Room {booking_info['room_number']} checked out successfully!\n\n"
                 message += f"Guest: {booking_info['customer']}\n"
                 message += f"Stay: {booking_info['period']}"
-                messagebox.showinfo("Check Out Complete", message)
+                if booking_info['nights']:
+                    message += f" ({booking_info['nights']} nights)"
+                if self.confirm_saved():
+                    messagebox.showinfo("Check Out Complete", message)
                 self.show_all_rooms()
                 dialog.destroy()
             else:
@@ -409,13 +2800,534 @@ class HotelGUI:
 
         ttk.Button(dialog, text="Confirm Checkout", command=confirm_checkout).grid(row=1, column=0, columnspan=2, pady=10)
 
+    def selected_room_numbers(self):
+        """Return the room numbers of the rows selected in the table"""
+        if self.virtual:
+            self.on_tree_select()
+            return sorted(self.virtual_selection)
+        return [int(self.tree.item(item, 'values')[0]) for item in self.tree.selection()]
+
+    def on_tree_select(self, event=None):
+        """In a virtual view, record the selection by room number for the rooms now in the tree"""
+        if not self.virtual:
+            return
+        selected = set(self.tree.selection())
+        for number, item in self.tree_items.items():
+            if item in selected:
+                self.virtual_selection.add(number)
+            else:
+                self.virtual_selection.discard(number)
+
+    def book_selected(self):
+        """Show a dialog booking every selected room for one group"""
+        room_numbers = self.selected_room_numbers()
+        if not room_numbers:
+            messagebox.showinfo("No Selection", "Select one or more rooms in the table first.")
+            return
+
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Book Selected Rooms")
+
+        ttk.Label(dialog, text="Rooms:").grid(row=0, column=0, padx=5, pady=5, sticky=tk.W)
+        ttk.Label(dialog, text=", ".join(map(str, room_numbers))).grid(row=0, column=1, padx=5, pady=5, sticky=tk.W)
+
+        ttk.Label(dialog, text="Customer Name:").grid(row=1, column=0, padx=5, pady=5, sticky=tk.W)
+        name_entry = ttk.Entry(dialog)
+        name_entry.grid(row=1, column=1, padx=5, pady=5)
+
+        ttk.Label(dialog, text="Check-in Date:").grid(row=2, column=0, padx=5, pady=5, sticky=tk.W)
+        checkin_entry = ttk.Entry(dialog)
+        checkin_entry.grid(row=2, column=1, padx=5, pady=5)
+        ttk.Button(dialog, text="Select Date", command=lambda: self.show_calendar(dialog, checkin_entry)) \
+            .grid(row=2, column=2, padx=5, pady=5)
+
+        ttk.Label(dialog, text="Check-out Date:").grid(row=3, column=0, padx=5, pady=5, sticky=tk.W)
+        checkout_entry = ttk.Entry(dialog)
+        checkout_entry.grid(row=3, column=1, padx=5, pady=5)
+        ttk.Button(dialog, text="Select Date", command=lambda: self.show_calendar(dialog, checkout_entry)) \
+            .grid(row=3, column=2, padx=5, pady=5)
+
+        def confirm_booking():
+            customer = name_entry.get()
+            check_in = checkin_entry.get()
+            check_out = checkout_entry.get()
+            if not customer or not check_in or not check_out:
+                messagebox.showerror("Error", "All fields are required!")
+                return
+
+            results = self.hotel.book_rooms([(number, customer, check_in, check_out) for number in room_numbers])
+            failed = [result for result in results if not result['success']]
+            if failed:
+                messagebox.showerror("Error", "No rooms were booked:\n\n" + "\n".join(
+                    f"Room {result['room_number']}: {result['error']}" for result in failed))
+                return
+            if self.confirm_saved():
+                messagebox.showinfo("Success", f"{len(results)} rooms booked for {customer}.")
+            self.show_all_rooms()
+            dialog.destroy()
+
+        ttk.Button(dialog, text="Confirm Booking", command=confirm_booking).grid(row=4, column=0, columnspan=3, pady=10)
+
+    def check_out_selected(self):
+        """Check out every selected room after confirmation"""
+        room_numbers = self.selected_room_numbers()
+        if not room_numbers:
+            messagebox.showinfo("No Selection", "Select one or more booked rooms in the table first.")
+            return
+        rooms = [self.hotel.find_room(number) for number in room_numbers]
+        listing = "\n".join(f"Room {room.room_number}: {room.customer_name or 'not booked'}"
+                            for room in rooms if room is not None)
+        if not messagebox.askyesno("Check Out", f"Check out these {len(room_numbers)} rooms?\n\n{listing}"):
+            return
+
+        results = self.hotel.check_out_many(room_numbers)
+        failed = [result for result in results if not result['success']]
+        if failed:
+            messagebox.showerror("Error", "No rooms were checked out:\n\n" + "\n".join(
+                f"Room {result['room_number']}: {result['error']}" for result in failed))
+            return
+        message = "\n".join(f"Room {result['room_number']}: {result['customer']} ({result['period']})"
+                            for result in results)
+        if self.confirm_saved():
+            messagebox.showinfo("Check Out Complete", f"{len(results)} rooms checked out.\n\n{message}")
+        self.show_all_rooms()
+
+    def confirm_saved(self):
+        """Wait until the last change is on disk, reporting a failed save"""
+        try:
+            self.hotel.wait_durable()
+        except (OSError, sqlite3.Error) as error:
+            messagebox.showerror("Error", f"The change was made but could not be saved yet: {error}\n"
+                                          "Saving will be retried in the background.")
+            return False
+        return True
+
+    def poll_shared_store(self):
+        """Show changes other terminals made to the shared store, then poll again"""
+        try:
+            self.hotel.refresh()
+        except OSError as error:
+            self.status_var.set(f"Could not read the shared room data: {error}")
+        self.root.after(self.SHARED_POLL_MS, self.poll_shared_store)
+
+    def on_close(self):
+        """Flush pending changes before the window closes, and say which could not be saved"""
+        unsaved = self.hotel.close()
+        if unsaved:
+            messagebox.showerror("Save Failed", describe_unsaved(unsaved, self.hotel.persistence.error))
+        self.root.destroy()
+
     def clear_tree(self):
         """Clear all items from the treeview"""
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        self.tree.delete(*self.tree.get_children())
+        self.tree_items = {}
+        self.view_mode = None
+        if self.virtual:
+            self.virtual = False
+            self.virtual_window = (0, 0)
+            self.scrollbar.configure(command=self.tree.yview)
+            self.tree.configure(yscrollcommand=self.scrollbar.set)
+
+    def start_virtual_view(self):
+        """Page through the current view instead of inserting every row"""
+        self.virtual = True
+        self.virtual_window = (0, 0)
+        self.virtual_selection = set()
+        # The scrollbar now tracks the position in the whole view, not in the tree
+        self.tree.configure(yscrollcommand='')
+        self.scrollbar.configure(command=self.on_virtual_scroll)
+        self.render_virtual_window(0)
+
+    def virtual_row_count(self):
+        """Return the number of rows in the current virtual view"""
+        if self.view_mode == "all":
+            return len(self.hotel.get_all_rooms())
+        return len(self.hotel.available_slots(*self.view_filter))
+
+    def virtual_rows(self, start, stop):
+        """Fetch rows [start, stop) of the current virtual view from the HotelManager"""
+        if self.view_mode == "all":
+            return self.hotel.rooms_at(range(start, stop))
+        return self.hotel.rooms_at(self.hotel.available_slots(*self.view_filter)[start:stop])
+
+    def render_virtual_window(self, first, force=False):
+        """
+        Show the rows starting at `first`, materializing a new window only when needed.
 
+        The tree holds the visible rows plus VIRTUAL_OVERSCAN rows on either
+        side; scrolling within them only moves the tree's own view. Existing
+        items are reused, so re-rendering costs one update per row in the window.
+        """
+        total = self.virtual_row_count()
+        first = max(0, min(first, total - self.visible_rows))
+        self.virtual_first = first
+        start, stop = self.virtual_window
+        if force or not (start <= first and min(first + self.visible_rows, total) <= stop):
+            # Items are about to show other rooms, so the selection moves by room
+            # number; rooms that have left the view drop out of it
+            self.on_tree_select()
+            self.virtual_selection = {number for number in self.virtual_selection
+                                      if self.hotel.find_room(number) is not None and
+                                      self.shows_room(self.hotel.find_room(number))}
+            start = max(0, first - self.VIRTUAL_OVERSCAN)
+            stop = min(total, first + self.visible_rows + self.VIRTUAL_OVERSCAN)
+            rooms = self.virtual_rows(start, stop)
+            items = list(self.tree.get_children())
+            if len(items) > len(rooms):
+                self.tree.delete(*items[len(rooms):])
+                del items[len(rooms):]
+            while len(items) < len(rooms):
+                items.append(self.tree.insert('', tk.END))
+            self.tree_items = {}
+            for item, room in zip(items, rooms):
+                self.tree.item(item, values=self.room_values(room))
+                self.tree_items[room.room_number] = item
+            self.tree.selection_set([item for number, item in self.tree_items.items()
+                                     if number in self.virtual_selection])
+            self.virtual_window = (start, stop)
+        if stop > start:
+            self.tree.yview_moveto((first - start) / (stop - start))
+        if total:
+            self.scrollbar.set(first / total, min(first + self.visible_rows, total) / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def on_virtual_scroll(self, action, amount, unit=None):
+        """Handle the scrollbar in a virtual view"""
+        if action == tk.MOVETO:
+            first = int(float(amount) * self.virtual_row_count())
+        elif unit == tk.PAGES:
+            first = self.virtual_first + int(amount) * self.visible_rows
+        else:
+            first = self.virtual_first + int(amount)
+        self.render_virtual_window(first)
+
+    def on_mouse_wheel(self, event):
+        """Scroll a virtual view with the mouse wheel"""
+        if not self.virtual:
+            return None
+        if event.num == 4 or event.delta > 0:
+            step = -3
+        else:
+            step = 3
+        self.render_virtual_window(self.virtual_first + step)
+        return "break"
+
+    def on_tree_resized(self, event):
+        """Recompute how many rows fit in the tree"""
+        row_height = int(ttk.Style().lookup('Treeview', 'rowheight') or 20)
+        # Leave room for the column headings
+        self.visible_rows = max(1, (event.height - row_height) // row_height)
+        if self.virtual:
+            self.render_virtual_window(self.virtual_first)
+
+
+def callback_name(func):
+    """Name a Tk callback after the Python function it ends up calling"""
+    while isinstance(func, partial):
+        func = func.func
+    name = getattr(func, '__qualname__', None) or repr(func)
+    if name == "Misc.after.<locals>.callit":
+        # after() wraps its function in a closure; report the function itself
+        cells = dict(zip(func.__code__.co_freevars, func.__closure__ or ()))
+        if 'func' in cells:
+            return callback_name(cells['func'].cell_contents)
+    return name
+
+
+class CallbackProfiler:
+    """
+    Profiles a Tk application one callback at a time.
+
+    While installed, every call Tk makes into Python (button commands,
+    event bindings, after() timers, window protocols) runs under a
+    cProfile.Profile kept for that callback, and its wall time is recorded
+    in a LatencyHistogram. Treeview inserts are timed as well. Callbacks run
+    from a nested event loop, e.g. while a message box is open, count towards
+    the callback that opened it.
+    """
+    def __init__(self):
+        self.profiles = {}
+        self.histograms = {}
+        self.active = False
+        self.original_call = None
+        self.original_insert = None
+
+    def install(self):
+        """Start profiling Tk callbacks and Treeview inserts"""
+        profiler = self
+        original_call = self.original_call = tk.CallWrapper.__call__
+        original_insert = self.original_insert = ttk.Treeview.insert
+        inserts = self.histograms.setdefault("ttk.Treeview.insert", LatencyHistogram())
+        clock = time.perf_counter_ns
+
+        def call(wrapper, *args):
+            if profiler.active:
+                return original_call(wrapper, *args)
+            name = callback_name(wrapper.func)
+            profile = profiler.profiles.get(name)
+            if profile is None:
+                profile = profiler.profiles[name] = cProfile.Profile()
+                profiler.histograms[name] = LatencyHistogram()
+            profiler.active = True
+            started = clock()
+            profile.enable()
+            try:
+                return original_call(wrapper, *args)
+            finally:
+                profile.disable()
+                profiler.histograms[name].record(clock() - started)
+                profiler.active = False
+
+        def insert(tree, *args, **kwargs):
+            started = clock()
+            try:
+                return original_insert(tree, *args, **kwargs)
+            finally:
+                inserts.record(clock() - started)
+
+        tk.CallWrapper.__call__ = call
+        ttk.Treeview.insert = insert
+
+    def uninstall(self):
+        """Stop profiling and restore Tk's own callback dispatch"""
+        if self.original_call is not None:
+            tk.CallWrapper.__call__ = self.original_call
+            ttk.Treeview.insert = self.original_insert
+            self.original_call = self.original_insert = None
+
+    def summary(self):
+        """Return a table of every callback and of Treeview inserts, by total time"""
+        rows = sorted(((name, histogram) for name, histogram in self.histograms.items() if histogram.count),
+                      key=lambda item: item[1].total, reverse=True)
+        lines = ["Wall times include the profiler's own overhead.",
+                 f"{'callback':<60} {'calls':>7} {'total s':>9} {'mean ms':>9} {'p99 ms':>9} {'max ms':>9}"]
+        for name, histogram in rows:
+            stats = histogram.snapshot()
+            lines.append(f"{name:<60} {stats['count']:>7} {histogram.total / 1e9:>9.3f} {stats['mean_ms']:>9.3f} "
+                         f"{stats['p99_ms']:>9.3f} {stats['max_ms']:>9.3f}")
+        return "\n".join(lines) + "\n"
+
+    def write_reports(self, directory):
+        """
+        Write the summary to callbacks.txt in `directory`, and for every
+        callback a .prof file (for pstats or snakeviz) plus a .txt listing of
+        its 30 most expensive functions by cumulative time.
+        """
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "callbacks.txt"), mode='w') as file:
+            file.write(self.summary())
+        for name, profile in self.profiles.items():
+            base = os.path.join(directory, re.sub(r"[^A-Za-z0-9_.-]+", "_", name))
+            profile.dump_stats(base + ".prof")
+            with open(base + ".txt", mode='w') as file:
+                file.write(f"{name}\n\n")
+                pstats.Stats(profile, stream=file).sort_stats("cumulative").print_stats(30)
+
+
+def add_room_commands(subparsers, parents=()):
+    """Add the list, filter, book, checkout, import and export subcommands, for main and for batch files"""
+    listing = subparsers.add_parser("list", parents=parents, help="List the rooms")
+    shown = listing.add_mutually_exclusive_group()
+    shown.add_argument("--booked", action="store_true", help="Only rooms holding a reservation")
+    shown.add_argument("--available", action="store_true", help="Only rooms holding no reservation")
+
+    filtering = subparsers.add_parser("filter", parents=parents, help="List the available rooms matching criteria")
+    filtering.add_argument("--ac", choices=("yes", "no"), help="AC room or not (default: either)")
+    filtering.add_argument("--double-bed", choices=("yes", "no"), help="Double bed or not (default: either)")
+    filtering.add_argument("--check-in", help="With --check-out, list rooms free for these dates (DD/MM/YYYY)")
+    filtering.add_argument("--check-out", help="Check-out date (DD/MM/YYYY)")
+
+    book = subparsers.add_parser("book", parents=parents, help="Book a room")
+    book.add_argument("room", type=int, help="Room number")
+    book.add_argument("customer", help="Customer name")
+    book.add_argument("check_in", help="Check-in date (DD/MM/YYYY)")
+    book.add_argument("check_out", help="Check-out date (DD/MM/YYYY)")
+
+    checkout = subparsers.add_parser("checkout", parents=parents, help="Check the current guest out of a room")
+    checkout.add_argument("room", type=int, help="Room number")
+
+    importing = subparsers.add_parser("import", parents=parents,
+                                      help="Replace the inventory with the rooms in a CSV snapshot")
+    importing.add_argument("file", help="CSV file in the format the application saves")
+
+    exporting = subparsers.add_parser("export", parents=parents, help="Write the inventory to a CSV snapshot")
+    exporting.add_argument("file", help="CSV file to write")
+
+
+def print_rooms(rooms, out):
+    """Print rooms as a table with the GUI's columns"""
+    rows = [HotelGUI.room_values(room) for room in rooms]
+    print(f"{'Room No.':>8}  {'AC':<3}  {'Bed Type':<8}  {'Status':<9}  {'Customer':<24}  Booking Period", file=out)
+    for number, ac, bed, status, customer, period in rows:
+        print(f"{number:>8}  {ac:<3}  {bed:<8}  {status:<9}  {customer:<24}  {period}".rstrip(), file=out)
+    print(f"{len(rows)} rooms", file=out)
+
+
+def run_room_command(hotel, args, out=sys.stdout):
+    """Carry out one parsed room command against a HotelManager; returns False if it failed"""
+    def fail(message):
+        print(f"error: {message}", file=sys.stderr)
+        return False
 
-if __name__ == "__main__":
+    if args.command == "list":
+        if args.available:
+            rooms = hotel.get_available_rooms()
+        else:
+            rooms = [room for room in hotel.get_all_rooms() if room.is_booked or not args.booked]
+        print_rooms(rooms, out)
+    elif args.command == "filter":
+        if bool(args.check_in) != bool(args.check_out):
+            return fail("--check-in and --check-out go together")
+        want_ac = None if args.ac is None else args.ac == "yes"
+        want_double_bed = None if args.double_bed is None else args.double_bed == "yes"
+        try:
+            rooms = hotel.get_available_rooms(want_ac, want_double_bed, args.check_in, args.check_out)
+        except ValueError as error:
+            return fail(error)
+        print_rooms(rooms, out)
+    elif args.command == "book":
+        if not hotel.book_room(args.room, args.customer, args.check_in, args.check_out):
+            return fail(f"could not book room {args.room} for {args.check_in} to {args.check_out} "
+                        "(no such room, invalid dates or an overlapping stay)")
+        print(f"Booked room {args.room} for {args.customer}, {args.check_in} to {args.check_out}", file=out)
+    elif args.command == "checkout":
+        success, booking_info = hotel.check_out(args.room)
+        if not success:
+            return fail(f"room {args.room} does not exist or is not booked")
+        print(f"Checked out {booking_info['customer']} from room {args.room} ({booking_info['period']})", file=out)
+    elif args.command == "import":
+        # Only the file itself: a journal kept next to it belongs to whoever owns it
+        try:
+            with open(args.file, newline='') as file:
+                rooms = read_room_rows(file)
+        except StopIteration:
+            # Not even a header row
+            rooms = []
+        except (OSError, ValueError, IndexError, csv.Error) as error:
+            return fail(f"cannot read {args.file}: {error}")
+        if not rooms:
+            return fail(f"{args.file} holds no rooms; importing it would empty the inventory")
+        hotel.replace_rooms(rooms)
+        print(f"Imported {len(rooms)} rooms from {args.file}", file=out)
+    elif args.command == "export":
+        if os.path.abspath(args.file) == os.path.abspath(hotel.csv_file):
+            return fail("export to a file other than the room data file itself")
+        try:
+            with hotel.consistent_rooms() as rooms, open(args.file, mode='w', newline='') as file:
+                write_room_rows(file, rooms)
+        except OSError as error:
+            return fail(f"cannot write {args.file}: {error}")
+        print(f"Exported {len(rooms)} rooms to {args.file}", file=out)
+    return True
+
+
+def run_batch(hotel, lines, stop_on_error=False, out=sys.stdout):
+    """
+    Run room commands, one per line, and persist their changes in one write.
+
+    Lines use the command-line syntax without the program name, e.g.
+    `book 12 "Jane Doe" 01/11/2026 03/11/2026`; blank lines and lines
+    starting with # are skipped. A failed command is reported and the rest
+    still run, unless stop_on_error is set. Returns the number of failures.
+    """
+    parser = argparse.ArgumentParser(prog="batch", add_help=False)
+    add_room_commands(parser.add_subparsers(dest="command", required=True))
+    failures = 0
+    with hotel.deferred_persistence():
+        for line_number, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                args = parser.parse_args(shlex.split(line))
+            except (SystemExit, ValueError):
+                # argparse has already described the problem on stderr
+                ok = False
+            else:
+                ok = run_room_command(hotel, args, out)
+            if not ok:
+                failures += 1
+                print(f"line {line_number} failed: {line}", file=sys.stderr)
+                if stop_on_error:
+                    break
+    return failures
+
+
+def main(argv=None):
+    """Run the GUI, or one of the command-line tools if a subcommand is given"""
+    parser = argparse.ArgumentParser(description="Hotel Management System")
+    subparsers = parser.add_subparsers(dest="command")
+
+    # Given after the subcommand; SUPPRESS keeps an absent --shared or --columnar from undoing one given before it
+    store_options = argparse.ArgumentParser(add_help=False)
+    store = store_options.add_mutually_exclusive_group()
+    store.add_argument("--csv-file", help="Room data file (default: hotel_rooms.csv next to this script)")
+    store.add_argument("--db", metavar="DB_FILE", help="Keep the rooms in this SQLite database instead")
+    store_options.add_argument("--shared", action="store_true", default=argparse.SUPPRESS,
+                               help="Share the room data files with other terminals and room commands")
+    store_options.add_argument("--columnar", action="store_true", default=argparse.SUPPRESS,
+                               help="Keep the rooms in a columnar RoomTable, for very large inventories")
+    add_room_commands(subparsers, parents=[store_options])
+    batch = subparsers.add_parser("batch", parents=[store_options],
+                                  help="Run room commands from a file or standard input, persisting once at the end")
+    batch.add_argument("file", nargs="?",
+                       help="One command per line, e.g. 'book 12 \"Jane Doe\" 01/11/2026 03/11/2026' "
+                            "(default: standard input)")
+    batch.add_argument("--stop-on-error", action="store_true", help="Stop at the first command that fails")
+
+    parser.add_argument("--shared", action="store_true",
+                        help="Let several terminals and room commands share the room data files")
+    parser.add_argument("--columnar", action="store_true",
+                        help="Keep the rooms in a columnar RoomTable, for very large inventories")
+    parser.add_argument("--instrument", action="store_true",
+                        help="Time the hot paths and print latency histograms on exit (GUI only)")
+    parser.add_argument("--metrics-file", help="Also write the histograms to this JSON file on exit")
+    parser.add_argument("--profile", metavar="DIR",
+                        help="Profile every GUI callback and write per-callback reports to DIR on exit")
+
+    args = parser.parse_args(argv)
+
+    if args.command in ("list", "filter", "book", "checkout", "import", "export", "batch"):
+        if args.db and args.shared:
+            parser.error("--shared shares the CSV files; it cannot be combined with --db")
+        storage = SqliteStorage(args.db) if args.db else None
+        hotel = HotelManager(args.csv_file, journal=True, storage=storage, columnar=args.columnar, shared=args.shared)
+        try:
+            if args.command == "batch":
+                if args.file:
+                    with open(args.file) as file:
+                        failures = run_batch(hotel, file, args.stop_on_error)
+                else:
+                    failures = run_batch(hotel, sys.stdin, args.stop_on_error)
+                if failures:
+                    parser.exit(1, f"{failures} commands failed\n")
+            elif not run_room_command(hotel, args):
+                parser.exit(1)
+        finally:
+            hotel.close()
+        return
+
+    if tk is None:
+        parser.exit(1, "The GUI needs tkinter, which this Python was built without\n")
+    profiler = None
+    if args.profile:
+        profiler = CallbackProfiler()
+        profiler.install()
     root = tk.Tk()
-    app = HotelGUI(root)
+    app = HotelGUI(root, shared=args.shared, instrument=args.instrument or bool(args.metrics_file),
+                   columnar=args.columnar)
     root.mainloop()
+    if profiler is not None:
+        profiler.uninstall()
+        profiler.write_reports(args.profile)
+        print(f"Callback profiles written to {args.profile}")
+    if app.hotel.instrumentation is not None:
+        print(app.hotel.instrumentation.export_text(), end="")
+        if args.metrics_file:
+            with open(args.metrics_file, mode='w') as file:
+                file.write(app.hotel.instrumentation.export_json())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,762 @@
+"""
+Measurement tools for the Hotel Management System.
+
+Run next to "Hotel Management.py" and hotel_service.py, e.g.
+
+    python hotel_bench.py bench-memory --rooms 100000
+    python hotel_bench.py stress-locks --threads 16
+    python hotel_bench.py load-test --connections 32 --pipeline 4
+    python hotel_bench.py bench --sizes 45,1000 --output bench.json
+    python hotel_bench.py replay --events 50000 --write-behind
+"""
+import argparse
+import asyncio
+import gc
+import json
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import date, datetime
+
+# hotel_service loads "Hotel Management.py" as the module hotel_management
+from hotel_service import HotelService
+from hotel_management import (FSYNC_POLICIES, CsvStorage, HotelManager, Reservation, Room, add_reservation,
+                              format_day, parse_day, room_stays)
+
+
+def measure_room_memory(count=1_000_000):
+    """
+    Compare the memory taken by slotted Rooms against dict-backed rooms.
+
+    Args:
+        count: Number of rooms to allocate with each representation.
+
+    Returns:
+        A dict mapping "dict" and "slots" to the bytes allocated for `count` rooms.
+    """
+    class DictRoom:
+        """The Room layout before __slots__, kept only for comparison."""
+        def __init__(self, room_number, is_ac=False, is_double_bed=False, is_booked=False, customer_name="", check_in="", check_out=""):
+            self.room_number = room_number
+            self.is_ac = is_ac
+            self.is_double_bed = is_double_bed
+            self.is_booked = is_booked
+            self.customer_name = customer_name
+            self.check_in = check_in
+            self.check_out = check_out
+
+    results = {}
+    for label, room_class in (("dict", DictRoom), ("slots", Room)):
+        gc.collect()
+        tracemalloc.start()
+        rooms = [room_class(i, is_ac=bool(i & 1), is_double_bed=bool(i & 2)) for i in range(1, count + 1)]
+        results[label] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del rooms
+    return results
+
+
+def stress_bookings(threads=8, attempts=2000, rooms=8, columnar=False):
+    """
+    Race threads booking and checking out the same few rooms, then look for double bookings.
+
+    Every thread tries to book random rooms for overlapping stays under its
+    own customer names, and now and then checks a room out. The manager runs
+    with journaling and write-behind on a temporary file.
+
+    Returns:
+        A dict with the number of 'bookings' and 'checkouts' that succeeded,
+        the elapsed 'seconds' and a list of 'problems' (empty if consistent).
+    """
+    base = parse_day("01/01/2030")
+    stays = [(format_day(base + offset), format_day(base + offset + length))
+             for offset in range(20) for length in (1, 3)]
+    won = [[] for _ in range(threads)]
+    checked_out = [[] for _ in range(threads)]
+    start_line = threading.Barrier(threads)
+
+    def worker(index):
+        rng = random.Random(index)
+        start_line.wait()
+        for attempt in range(attempts):
+            room_number = rng.randint(1, rooms)
+            if rng.random() < 0.1:
+                success, booking_info = hotel.check_out(room_number)
+                if success:
+                    checked_out[index].append((room_number, booking_info['customer']))
+                continue
+            customer = f"T{index}-{attempt}"
+            check_in, check_out = rng.choice(stays)
+            if hotel.book_room(room_number, customer, check_in, check_out):
+                won[index].append((room_number, customer, check_in, check_out))
+
+    with tempfile.TemporaryDirectory() as directory:
+        csv_file = os.path.join(directory, "hotel_rooms.csv")
+        hotel = HotelManager(csv_file, journal=True, columnar=columnar, write_behind=True)
+        for number in range(46, rooms + 1):
+            hotel.add_room(Room(number))
+        for number in range(rooms + 1, 46):
+            hotel.remove_room(number)
+
+        started = time.perf_counter()
+        pool = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        problems = []
+        gone = {entry for entries in checked_out for entry in entries}
+        expected = {}
+        for room_number, customer, check_in, check_out in (entry for entries in won for entry in entries):
+            if (room_number, customer) not in gone:
+                expected.setdefault(room_number, set()).add((customer, check_in, check_out))
+        for room in hotel.get_all_rooms():
+            held = list(room_stays(room))
+            if set(held) != expected.get(room.room_number, set()):
+                problems.append(f"room {room.room_number} holds {len(held)} stays, "
+                                f"expected {len(expected.get(room.room_number, ()))}")
+            spans = sorted((parse_day(check_in), parse_day(check_out)) for _, check_in, check_out in held)
+            if any(earlier[1] > later[0] for earlier, later in zip(spans, spans[1:])):
+                problems.append(f"room {room.room_number} is double-booked")
+        for check_in, check_out in stays:
+            free = {room.room_number for room in hotel.get_available_rooms(None, None, check_in, check_out)}
+            start, end = parse_day(check_in), parse_day(check_out)
+            actual = {room.room_number for room in hotel.get_all_rooms()
+                      if all(parse_day(stay_out) <= start or parse_day(stay_in) >= end
+                             for _, stay_in, stay_out in room_stays(room))}
+            if free != actual:
+                problems.append(f"night index disagrees with the rooms for {check_in} to {check_out}")
+
+        hotel.close()
+        reloaded = HotelManager(csv_file, journal=True)
+        if [sorted(room_stays(room)) for room in reloaded.get_all_rooms()] != \
+                [sorted(room_stays(room)) for room in hotel.get_all_rooms()]:
+            problems.append("reloaded rooms differ from the rooms in memory")
+        reloaded.close()
+
+    return {
+        'bookings': sum(map(len, won)),
+        'checkouts': sum(map(len, checked_out)),
+        'seconds': elapsed,
+        'problems': problems,
+    }
+
+
+def percentile(sorted_values, fraction):
+    """Return the value below which `fraction` of the sorted values fall (nearest rank)"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+async def drive_load(host, port, connections=16, requests=5000, pipeline=1, write_ratio=0.2, rooms=45):
+    """
+    Send a mix of availability queries, bookings and checkouts to a HotelService.
+
+    Each connection is kept alive and sends `pipeline` requests before reading
+    their responses. Latency is measured from sending a request to reading its
+    response.
+
+    Returns:
+        A dict with 'requests', 'seconds', 'requests_per_second', 'p50_ms',
+        'p99_ms', 'max_ms' and a count of responses per HTTP status.
+    """
+    base = parse_day("01/01/2031")
+    latencies = []
+    statuses = {}
+
+    def make_request(rng, index):
+        if rng.random() >= write_ratio:
+            start = base + rng.randint(0, 300)
+            return (f"GET /rooms/available?check_in={format_day(start)}&check_out={format_day(start + 3)} "
+                    f"HTTP/1.1\r\nHost: {host}\r\n\r\n").encode()
+        if rng.random() < 0.5:
+            body = {'room_number': rng.randint(1, rooms)}
+            path = "/checkouts"
+        else:
+            start = base + rng.randint(0, 300)
+            body = {'room_number': rng.randint(1, rooms), 'customer_name': f"Load {index}",
+                    'check_in': format_day(start), 'check_out': format_day(start + rng.randint(1, 5))}
+            path = "/bookings"
+        data = json.dumps(body).encode()
+        return (f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(data)}\r\n\r\n").encode() + data
+
+    async def client(index, count):
+        rng = random.Random(index)
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            sent = 0
+            while sent < count:
+                burst = [make_request(rng, sent + i) for i in range(min(pipeline, count - sent))]
+                started = time.perf_counter()
+                writer.write(b"".join(burst))
+                await writer.drain()
+                for _ in burst:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                    status = int(head.split(b" ", 2)[1])
+                    length = 0
+                    for line in head.split(b"\r\n"):
+                        if line.lower().startswith(b"content-length:"):
+                            length = int(line.split(b":", 1)[1])
+                    await reader.readexactly(length)
+                    latencies.append(time.perf_counter() - started)
+                    statuses[status] = statuses.get(status, 0) + 1
+                sent += len(burst)
+        finally:
+            writer.close()
+
+    shares = [requests // connections + (i < requests % connections) for i in range(connections)]
+    started = time.perf_counter()
+    await asyncio.gather(*(client(index, share) for index, share in enumerate(shares) if share))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'seconds': elapsed,
+        'requests_per_second': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'max_ms': latencies[-1] * 1000 if latencies else 0.0,
+        'statuses': statuses,
+    }
+
+
+def load_test_service(connections=16, requests=5000, pipeline=1, write_ratio=0.2, host=None, port=None):
+    """
+    Run drive_load against a HotelService.
+
+    Without a host, a service over a fresh temporary inventory is started on
+    a free local port in a background thread and stopped afterwards.
+    """
+    if host is not None:
+        return asyncio.run(drive_load(host, port, connections, requests, pipeline, write_ratio))
+
+    with tempfile.TemporaryDirectory() as directory:
+        hotel = HotelManager(os.path.join(directory, "hotel_rooms.csv"), journal=True, write_behind=True)
+        service = HotelService(hotel)
+        loop = asyncio.new_event_loop()
+        port = loop.run_until_complete(service.start("127.0.0.1", 0))
+        thread = threading.Thread(target=loop.run_forever, name="hotel-service", daemon=True)
+        thread.start()
+        try:
+            return asyncio.run(drive_load("127.0.0.1", port, connections, requests, pipeline, write_ratio,
+                                          rooms=len(hotel.get_all_rooms())))
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            service.server.close()
+            loop.run_until_complete(service.server.wait_closed())
+            loop.close()
+            hotel.close()
+
+
+def generate_inventory(count, booked_share=0.3, seed=0):
+    """Return `count` rooms with random features, about `booked_share` of them holding a stay"""
+    rng = random.Random(seed)
+    base = parse_day("01/01/2030")
+    rooms = []
+    for number in range(1, count + 1):
+        room = Room(number, is_ac=rng.random() < 0.5, is_double_bed=rng.random() < 0.5)
+        if rng.random() < booked_share:
+            start = base + rng.randint(0, 60)
+            add_reservation(room, Reservation(f"Guest {number}", start, start + rng.randint(1, 7)))
+        rooms.append(room)
+    return rooms
+
+
+def time_operation(operation, count):
+    """Run `operation` `count` times; returns the sorted latencies in seconds"""
+    latencies = []
+    for _ in range(count):
+        started = time.perf_counter()
+        operation()
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return latencies
+
+
+def peak_memory(operation, count=1):
+    """Return the peak bytes newly allocated while running `operation` `count` times"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        for _ in range(count):
+            operation()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_operations(sizes=(45, 1000, 100_000, 1_000_000), samples=2000, repeat=5, columnar=False,
+                         fsync="batched", measure_memory=True):
+    """
+    Time HotelManager's core operations on generated inventories of each size.
+
+    initialize_rooms (constructing a manager over an existing snapshot),
+    load_from_csv and save_to_csv run `repeat` times; get_available_rooms
+    (with and without dates), book_room and check_out run `samples` times.
+    The manager journals its changes and writes them synchronously.
+
+    Returns:
+        A list of dicts, one per (size, operation), with the sample count,
+        throughput, mean/p50/p90/p99/max latency in milliseconds, and the
+        peak memory newly allocated by the operation (None if not measured).
+    """
+    results = []
+    base = parse_day("01/01/2032")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            csv_file = os.path.join(directory, "hotel_rooms.csv")
+            CsvStorage(csv_file, fsync="never").save(generate_inventory(size))
+            rng = random.Random(size)
+            holder = {}
+
+            def initialize():
+                holder['hotel'] = HotelManager(csv_file, journal=True, columnar=columnar, fsync=fsync)
+
+            def available():
+                hotel.get_available_rooms(rng.choice((None, True, False)), rng.choice((None, True, False)))
+
+            def available_dated():
+                start = parse_day("01/01/2030") + rng.randint(0, 60)
+                hotel.get_available_rooms(rng.choice((None, True, False)), rng.choice((None, True, False)),
+                                          format_day(start), format_day(start + rng.randint(1, 7)))
+
+            def book():
+                start = base + rng.randint(0, 3000)
+                hotel.book_room(rng.randint(1, size), "Benchmark", format_day(start), format_day(start + 2))
+
+            def check_out():
+                hotel.check_out(rng.randint(1, size))
+
+            initialize()
+            hotel = holder['hotel']
+            operations = [
+                ("initialize_rooms", initialize, repeat),
+                ("load_from_csv", hotel.load_from_csv, repeat),
+                ("save_to_csv", hotel.save_to_csv, repeat),
+                ("get_available_rooms", available, samples),
+                ("get_available_rooms_dated", available_dated, samples),
+                ("book_room", book, samples),
+                ("check_out", check_out, samples),
+            ]
+            for name, operation, count in operations:
+                latencies = time_operation(operation, count)
+                total = sum(latencies)
+                memory = None
+                if measure_memory:
+                    memory = peak_memory(operation, 1 if count == repeat else min(count, 100))
+                results.append({
+                    'rooms': size,
+                    'operation': name,
+                    'samples': count,
+                    'ops_per_second': count / total if total else 0.0,
+                    'mean_ms': total / count * 1000,
+                    'p50_ms': percentile(latencies, 0.50) * 1000,
+                    'p90_ms': percentile(latencies, 0.90) * 1000,
+                    'p99_ms': percentile(latencies, 0.99) * 1000,
+                    'max_ms': latencies[-1] * 1000,
+                    'peak_memory_bytes': memory,
+                })
+            holder.clear()
+            hotel.close()
+    return results
+
+
+def compare_benchmarks(results, baseline, threshold=1.25):
+    """
+    Compare benchmark results against a baseline run with the same layout.
+
+    Returns:
+        (lines, regressions): a report line per operation found in both runs,
+        and how many of them got slower at the median by more than `threshold`.
+    """
+    previous = {(entry['rooms'], entry['operation']): entry for entry in baseline}
+    lines = []
+    regressions = 0
+    for entry in results:
+        old = previous.get((entry['rooms'], entry['operation']))
+        if old is None or not old['p50_ms']:
+            continue
+        ratio = entry['p50_ms'] / old['p50_ms']
+        flag = ""
+        if ratio > threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        lines.append(f"{entry['operation']:<26} {entry['rooms']:>9} rooms: p50 {old['p50_ms']:.4f} -> "
+                     f"{entry['p50_ms']:.4f} ms ({ratio:.2f}x){flag}")
+    return lines, regressions
+
+
+def season_weights(days, first_day):
+    """Relative demand per arrival day: a summer peak, a year-end peak and busier weekends"""
+    weights = []
+    for offset in range(days):
+        day_of_year = date.fromordinal(first_day + offset).timetuple().tm_yday
+        weight = 1.0 + 1.5 * math.exp(-((day_of_year - 200) / 30) ** 2) + math.exp(-((day_of_year - 358) / 8) ** 2)
+        if date.fromordinal(first_day + offset).weekday() >= 4:
+            weight += 0.3
+        weights.append(weight)
+    return weights
+
+
+def generate_workload(events=10000, days=365, seed=0, first_day="01/01/2031"):
+    """
+    Generate a synthetic stream of front-desk events.
+
+    Arrival dates follow seasonal demand, stays last one night to two weeks,
+    and searches mix AC and double-bed filters. The mix is roughly 55%
+    availability queries, 27% single bookings (search, then take the first
+    match), 3% group bookings of 3-20 rooms and 15% checkouts.
+
+    Returns:
+        A list of JSON-ready event dicts with an "op" of "query", "book",
+        "group" or "checkout".
+    """
+    rng = random.Random(seed)
+    start = parse_day(first_day)
+    weights = season_weights(days, start)
+    arrivals = rng.choices(range(days), weights=weights, k=events)
+    stream = []
+    for index, arrival in enumerate(arrivals):
+        check_in = start + arrival
+        check_out = check_in + min(14, 1 + int(rng.expovariate(1 / 2.5)))
+        event = {
+            'op': "query",
+            'ac': rng.choices((True, False, None), weights=(5, 2, 3))[0],
+            'double_bed': rng.choices((True, False, None), weights=(4, 3, 3))[0],
+            'check_in': format_day(check_in),
+            'check_out': format_day(check_out),
+        }
+        kind = rng.random()
+        if kind >= 0.85:
+            event = {'op': "checkout"}
+        elif kind >= 0.82:
+            event['op'] = "group"
+            event['customer'] = f"Group {index}"
+            event['rooms'] = rng.randint(3, 20)
+            event['ac'] = event['double_bed'] = None
+        elif kind >= 0.55:
+            event['op'] = "book"
+            event['customer'] = f"Guest {index}"
+        stream.append(event)
+    return stream
+
+
+def journal_workload(csv_file):
+    """Turn the journal kept next to a CSV snapshot into exact book_room/check_out events"""
+    rows, _ = CsvStorage(csv_file).read_journal()
+    events = []
+    for row in rows:
+        if row[0] == "book":
+            events.append({'op': "book_room", 'room_number': int(row[1]), 'customer': row[2],
+                           'check_in': row[3], 'check_out': row[4]})
+        elif row[0] == "checkout":
+            events.append({'op': "check_out", 'room_number': int(row[1])})
+    return events
+
+
+def replay_workload(hotel, events, rate=None, seed=0):
+    """
+    Replay events against a HotelManager, optionally paced at `rate` events per second.
+
+    Pacing is open-loop: event i is due `i / rate` seconds after the start, and
+    an event that starts late adds to the queueing delay. Time spent inside
+    the storage backend is measured separately as the persistence cost.
+
+    Returns:
+        A dict with the sustained 'ops_per_second', queueing delay and service
+        time percentiles in milliseconds, the persistence cost, and per-op
+        counts of 'ok' and 'failed' outcomes.
+    """
+    rng = random.Random(seed)
+    storage = hotel.storage
+    persistence = {'seconds': 0.0, 'writes': 0}
+
+    def timed(write):
+        def wrapper(*args):
+            started = time.perf_counter()
+            try:
+                return write(*args)
+            finally:
+                persistence['seconds'] += time.perf_counter() - started
+                persistence['writes'] += 1
+        return wrapper
+
+    storage.record_changes = timed(storage.record_changes)
+    storage.save = timed(storage.save)
+    booked = []
+    outcomes = {}
+    queueing = []
+    service = []
+
+    def run(event):
+        op = event['op']
+        if op == "query":
+            hotel.get_available_rooms(event['ac'], event['double_bed'], event['check_in'], event['check_out'])
+            return True
+        if op == "book":
+            rooms = hotel.get_available_rooms(event['ac'], event['double_bed'], event['check_in'], event['check_out'])
+            if not rooms or not hotel.book_room(rooms[0].room_number, event['customer'],
+                                                event['check_in'], event['check_out']):
+                return False
+            booked.append(rooms[0].room_number)
+            return True
+        if op == "group":
+            rooms = hotel.get_available_rooms(None, None, event['check_in'], event['check_out'])[:event['rooms']]
+            if len(rooms) < event['rooms']:
+                return False
+            results = hotel.book_rooms([(room.room_number, event['customer'], event['check_in'], event['check_out'])
+                                        for room in rooms])
+            if not results[0]['success']:
+                return False
+            booked.extend(room.room_number for room in rooms)
+            return True
+        if op == "checkout":
+            if not booked:
+                return False
+            room_number = booked.pop(rng.randrange(len(booked)))
+            return hotel.check_out(room_number)[0]
+        if op == "book_room":
+            return hotel.book_room(event['room_number'], event['customer'], event['check_in'], event['check_out'])
+        if op == "check_out":
+            return hotel.check_out(event['room_number'])[0]
+        raise ValueError(f"Unknown workload op {op!r}")
+
+    try:
+        started = time.perf_counter()
+        for index, event in enumerate(events):
+            now = time.perf_counter()
+            if rate:
+                due = started + index / rate
+                if due > now:
+                    time.sleep(due - now)
+                    now = time.perf_counter()
+                queueing.append(max(0.0, now - due))
+            success = run(event)
+            service.append(time.perf_counter() - now)
+            counts = outcomes.setdefault(event['op'], {'ok': 0, 'failed': 0})
+            counts['ok' if success else 'failed'] += 1
+        hotel.wait_durable()
+        elapsed = time.perf_counter() - started
+    finally:
+        del storage.record_changes, storage.save
+
+    queueing.sort()
+    service.sort()
+    return {
+        'events': len(events),
+        'seconds': elapsed,
+        'target_rate': rate,
+        'ops_per_second': len(events) / elapsed if elapsed else 0.0,
+        'queue_p50_ms': percentile(queueing, 0.50) * 1000,
+        'queue_p99_ms': percentile(queueing, 0.99) * 1000,
+        'queue_max_ms': queueing[-1] * 1000 if queueing else 0.0,
+        'service_p50_ms': percentile(service, 0.50) * 1000,
+        'service_p99_ms': percentile(service, 0.99) * 1000,
+        'persistence_seconds': persistence['seconds'],
+        'persistence_writes': persistence['writes'],
+        'persistence_share': persistence['seconds'] / elapsed if elapsed else 0.0,
+        'outcomes': outcomes,
+    }
+
+
+def run_replay(events, rooms=45, rate=None, seed=0, base_snapshot=None, data_dir=None, write_behind=False,
+               columnar=False, fsync="batched"):
+    """
+    Replay events against a fresh journaled HotelManager; see replay_workload.
+
+    The inventory is `rooms` generated free rooms, or a copy of `base_snapshot`
+    (without its journal). The files live in `data_dir` if given, so that the
+    journal of the run can be kept and replayed later, and are never compacted.
+    """
+    if data_dir:
+        os.makedirs(data_dir, exist_ok=True)
+    with tempfile.TemporaryDirectory() as scratch:
+        csv_file = os.path.join(data_dir or scratch, "hotel_rooms.csv")
+        storage = CsvStorage(csv_file, fsync="never")
+        if base_snapshot is not None:
+            shutil.copyfile(base_snapshot, csv_file)
+            if os.path.exists(storage.journal_file):
+                os.remove(storage.journal_file)
+        else:
+            storage.save(generate_inventory(rooms, booked_share=0, seed=seed))
+        hotel = HotelManager(csv_file, journal=True, compact_every=sys.maxsize, columnar=columnar,
+                             write_behind=write_behind, fsync=fsync)
+        try:
+            return replay_workload(hotel, events, rate, seed)
+        finally:
+            hotel.close()
+
+
+def main(argv=None):
+    """Run one of the measurement tools"""
+    parser = argparse.ArgumentParser(description="Hotel Management measurement tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    bench_memory = subparsers.add_parser("bench-memory", help="Compare Room memory use with and without __slots__")
+    bench_memory.add_argument("--rooms", type=int, default=1_000_000, help="Number of rooms to allocate")
+
+    stress = subparsers.add_parser("stress-locks", help="Check that concurrent bookings never double-book a room")
+    stress.add_argument("--threads", type=int, default=8, help="Number of booking threads")
+    stress.add_argument("--attempts", type=int, default=2000, help="Booking attempts per thread")
+    stress.add_argument("--rooms", type=int, default=8, help="Number of rooms the threads compete for")
+    stress.add_argument("--columnar", action="store_true", help="Keep rooms in a RoomTable")
+
+    load_test = subparsers.add_parser("load-test", help="Measure the HTTP service's throughput and latency")
+    load_test.add_argument("--connections", type=int, default=16, help="Concurrent keep-alive connections")
+    load_test.add_argument("--requests", type=int, default=5000, help="Total number of requests")
+    load_test.add_argument("--pipeline", type=int, default=1, help="Requests in flight per connection")
+    load_test.add_argument("--write-ratio", type=float, default=0.2, help="Share of bookings and checkouts")
+    load_test.add_argument("--host", help="Test a running service instead of a fresh local one")
+    load_test.add_argument("--port", type=int, default=8080, help="Port of the running service")
+
+    bench = subparsers.add_parser("bench", help="Time the core HotelManager operations across inventory sizes")
+    bench.add_argument("--sizes", default="45,1000,100000,1000000",
+                       help="Comma-separated inventory sizes (default: 45,1000,100000,1000000)")
+    bench.add_argument("--samples", type=int, default=2000, help="Runs of each query, booking and checkout")
+    bench.add_argument("--repeat", type=int, default=5, help="Runs of initialize/load/save")
+    bench.add_argument("--columnar", action="store_true", help="Keep rooms in a RoomTable")
+    bench.add_argument("--fsync", choices=FSYNC_POLICIES, default="batched", help="Durability policy")
+    bench.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc peak-memory runs")
+    bench.add_argument("--output", help="Write the results to this JSON file")
+    bench.add_argument("--compare", help="JSON file of an earlier run to compare against")
+    bench.add_argument("--threshold", type=float, default=1.25,
+                       help="Slowdown of the median that counts as a regression (default: 1.25x)")
+
+    workload = subparsers.add_parser("workload", help="Generate a synthetic booking workload as JSON lines")
+    workload.add_argument("--events", type=int, default=10000, help="Number of events")
+    workload.add_argument("--days", type=int, default=365, help="Days of arrivals the stream covers")
+    workload.add_argument("--seed", type=int, default=0, help="Random seed")
+    workload.add_argument("--output", help="File to write (default: standard output)")
+
+    replay = subparsers.add_parser("replay", help="Replay a workload or a recorded journal against HotelManager")
+    source = replay.add_mutually_exclusive_group()
+    source.add_argument("--workload", help="JSON-lines workload file (default: generate one)")
+    source.add_argument("--from-journal", metavar="CSV_FILE",
+                        help="Replay the journal kept next to this snapshot, starting from the snapshot")
+    replay.add_argument("--events", type=int, default=10000, help="Events to generate without --workload")
+    replay.add_argument("--seed", type=int, default=0, help="Random seed for generation and replay")
+    replay.add_argument("--rooms", type=int, default=45, help="Rooms in the generated inventory")
+    replay.add_argument("--rate", type=float, help="Target events per second (default: as fast as possible)")
+    replay.add_argument("--write-behind", action="store_true", help="Persist from a background worker")
+    replay.add_argument("--columnar", action="store_true", help="Keep rooms in a RoomTable")
+    replay.add_argument("--fsync", choices=FSYNC_POLICIES, default="batched", help="Durability policy")
+    replay.add_argument("--data-dir", help="Keep the run's snapshot and journal in this directory")
+    replay.add_argument("--output", help="Write the report to this JSON file")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "bench-memory":
+        results = measure_room_memory(args.rooms)
+        saved = 1 - results["slots"] / results["dict"]
+        print(f"dict-backed Room: {results['dict'] / 2**20:.1f} MiB for {args.rooms} rooms")
+        print(f"slotted Room:     {results['slots'] / 2**20:.1f} MiB for {args.rooms} rooms ({saved:.0%} smaller)")
+        return
+
+    if args.command == "stress-locks":
+        results = stress_bookings(args.threads, args.attempts, args.rooms, args.columnar)
+        print(f"{results['bookings']} bookings and {results['checkouts']} checkouts "
+              f"from {args.threads} threads in {results['seconds']:.2f}s")
+        for problem in results['problems']:
+            print(f"FAIL: {problem}")
+        if results['problems']:
+            parser.exit(1)
+        print("OK: no double bookings")
+        return
+
+    if args.command == "load-test":
+        results = load_test_service(args.connections, args.requests, args.pipeline, args.write_ratio,
+                                    args.host, args.port)
+        print(f"{results['requests']} requests over {args.connections} connections "
+              f"(pipeline depth {args.pipeline}) in {results['seconds']:.2f}s")
+        print(f"throughput: {results['requests_per_second']:.0f} requests/s")
+        print(f"latency: p50 {results['p50_ms']:.2f} ms, p99 {results['p99_ms']:.2f} ms, max {results['max_ms']:.2f} ms")
+        print("statuses: " + ", ".join(f"{status}: {count}" for status, count in sorted(results['statuses'].items())))
+        return
+
+    if args.command == "bench":
+        sizes = [int(size) for size in args.sizes.split(",")]
+        results = benchmark_operations(sizes, args.samples, args.repeat, args.columnar, args.fsync,
+                                       measure_memory=not args.no_memory)
+        print(f"{'operation':<26} {'rooms':>9} {'ops/s':>11} {'p50 ms':>9} {'p99 ms':>9} {'peak MiB':>9}")
+        for entry in results:
+            memory = "-" if entry['peak_memory_bytes'] is None else f"{entry['peak_memory_bytes'] / 2**20:.1f}"
+            print(f"{entry['operation']:<26} {entry['rooms']:>9} {entry['ops_per_second']:>11.1f} "
+                  f"{entry['p50_ms']:>9.4f} {entry['p99_ms']:>9.4f} {memory:>9}")
+        if args.output:
+            with open(args.output, mode='w') as file:
+                json.dump({
+                    'created': datetime.now().isoformat(timespec='seconds'),
+                    'python': sys.version.split()[0],
+                    'platform': sys.platform,
+                    'settings': {'sizes': sizes, 'samples': args.samples, 'repeat': args.repeat,
+                                 'columnar': args.columnar, 'fsync': args.fsync},
+                    'results': results,
+                }, file, indent=2)
+        if args.compare:
+            with open(args.compare) as file:
+                baseline = json.load(file)['results']
+            lines, regressions = compare_benchmarks(results, baseline, args.threshold)
+            print()
+            print("\n".join(lines))
+            if regressions:
+                parser.exit(1, f"{regressions} operations regressed by more than {args.threshold}x\n")
+        return
+
+    if args.command == "workload":
+        events = generate_workload(args.events, args.days, args.seed)
+        lines = "".join(json.dumps(event) + "\n" for event in events)
+        if args.output:
+            with open(args.output, mode='w') as file:
+                file.write(lines)
+        else:
+            sys.stdout.write(lines)
+        return
+
+    if args.command == "replay":
+        base_snapshot = None
+        if args.from_journal and args.data_dir:
+            target = os.path.join(args.data_dir, "hotel_rooms.csv")
+            if os.path.exists(args.from_journal) and os.path.exists(target) and \
+                    os.path.samefile(args.from_journal, target):
+                parser.error("--data-dir holds the --from-journal snapshot itself, and the run would overwrite "
+                             "the journal it replays; pick another directory")
+        if args.from_journal:
+            events = journal_workload(args.from_journal)
+            base_snapshot = args.from_journal
+        elif args.workload:
+            with open(args.workload) as file:
+                events = [json.loads(line) for line in file if line.strip()]
+        else:
+            events = generate_workload(args.events, seed=args.seed)
+        results = run_replay(events, args.rooms, args.rate, args.seed, base_snapshot, args.data_dir,
+                             args.write_behind, args.columnar, args.fsync)
+        target = f"target {args.rate:.0f}/s" if args.rate else "unpaced"
+        print(f"{results['events']} events in {results['seconds']:.2f}s: "
+              f"{results['ops_per_second']:.0f} ops/s sustained ({target})")
+        print(f"queueing delay: p50 {results['queue_p50_ms']:.2f} ms, p99 {results['queue_p99_ms']:.2f} ms, "
+              f"max {results['queue_max_ms']:.2f} ms")
+        print(f"service time:   p50 {results['service_p50_ms']:.3f} ms, p99 {results['service_p99_ms']:.3f} ms")
+        print(f"persistence:    {results['persistence_writes']} writes, {results['persistence_seconds']:.2f}s "
+              f"({results['persistence_share']:.0%} of the run)")
+        for op, counts in sorted(results['outcomes'].items()):
+            print(f"  {op:<10} {counts['ok']:>7} ok {counts['failed']:>7} failed")
+        if args.output:
+            with open(args.output, mode='w') as file:
+                json.dump(results, file, indent=2)
+        return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+"""
+Headless HTTP/JSON booking service for the Hotel Management System.
+
+Serves the rooms kept by "Hotel Management.py" in the same directory, for
+kiosks and websites:
+
+    python hotel_service.py --port 8080
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import sqlite3
+import sys
+import traceback
+from urllib.parse import parse_qs, urlsplit
+
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Hotel Management.py")
+
+
+def load_app():
+    """
+    Import the application script as the module hotel_management.
+
+    Its file name has a space in it, so a plain import cannot find it.
+    """
+    module = sys.modules.get("hotel_management")
+    if module is None:
+        spec = importlib.util.spec_from_file_location("hotel_management", APP_FILE)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules["hotel_management"] = module
+        spec.loader.exec_module(module)
+    return module
+
+
+load_app()
+from hotel_management import (MAX_STAY_NIGHTS, HotelManager, Reservation, RoomVersionConflict, SqliteStorage,
+                              describe_unsaved, room_stays, valid_customer_name)
+
+
+class HotelService:
+    """
+    Headless HTTP/JSON booking service over a HotelManager, built on asyncio.
+
+    Connections are kept alive, and requests pipelined on one connection are
+    answered in order. Endpoints:
+
+        GET  /rooms                   every room
+        GET  /rooms/<number>          one room
+        GET  /rooms/available         free rooms; optional query parameters ac,
+                                      double_bed (yes/no) and check_in, check_out
+        POST /bookings                {"room_number", "customer_name", "check_in",
+                                       "check_out", optional "expected_version"}
+        POST /checkouts               {"room_number", optional "expected_version"}
+        GET  /metrics                 latency histograms when instrumented
+                                      (?format=text for a plain-text table)
+
+    Bookings and checkouts are answered once they are on disk, using the
+    HotelManager's async API so that no thread waits on each one.
+    """
+    REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               409: "Conflict", 411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error",
+               503: "Service Unavailable"}
+    # Largest request head and body accepted, in bytes
+    MAX_HEAD = 16384
+    MAX_BODY = 65536
+
+    def __init__(self, hotel):
+        self.hotel = hotel
+        self.server = None
+
+    async def start(self, host="127.0.0.1", port=8080):
+        """Start listening; returns the port actually bound (useful with port 0)"""
+        self.server = await asyncio.start_server(self.handle_connection, host, port, limit=self.MAX_HEAD)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self, host="127.0.0.1", port=8080):
+        """Start listening and serve until cancelled"""
+        await self.start(host, port)
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def handle_connection(self, reader, writer):
+        """Answer the requests on one connection, in order, until either side closes it"""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except asyncio.IncompleteReadError:
+                    break
+                except asyncio.LimitOverrunError:
+                    writer.write(self.response(413, {'error': "Request head too large"}, keep_alive=False))
+                    break
+                request_line, *header_lines = head.decode('latin-1').split("\r\n")
+                try:
+                    method, target, version = request_line.split(" ")
+                except ValueError:
+                    writer.write(self.response(400, {'error': "Malformed request line"}, keep_alive=False))
+                    break
+                headers = {}
+                for line in header_lines:
+                    if line:
+                        name, _, value = line.partition(":")
+                        headers[name.strip().lower()] = value.strip()
+                connection = headers.get('connection', "").lower()
+                keep_alive = connection != "close" and (version == "HTTP/1.1" or connection == "keep-alive")
+
+                if 'transfer-encoding' in headers:
+                    writer.write(self.response(411, {'error': "Send a Content-Length"}, keep_alive=False))
+                    break
+                length = headers.get('content-length', "0")
+                if not length.isdigit():
+                    writer.write(self.response(400, {'error': "Bad Content-Length"}, keep_alive=False))
+                    break
+                if int(length) > self.MAX_BODY:
+                    writer.write(self.response(413, {'error': "Request body too large"}, keep_alive=False))
+                    break
+                try:
+                    body = await reader.readexactly(int(length))
+                except asyncio.IncompleteReadError:
+                    break
+
+                status, payload = await self.dispatch(method, target, body)
+                writer.write(self.response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def response(self, status, payload, keep_alive=True):
+        """Encode a JSON response, or a plain-text one if `payload` is a string"""
+        if isinstance(payload, str):
+            body = payload.encode()
+            content_type = "text/plain; charset=utf-8"
+        else:
+            body = json.dumps(payload).encode()
+            content_type = "application/json"
+        head = (f"HTTP/1.1 {status} {self.REASONS[status]}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n")
+        if not keep_alive:
+            head += "Connection: close\r\n"
+        return (head + "\r\n").encode('latin-1') + body
+
+    async def dispatch(self, method, target, body):
+        """Answer one request; returns (status, payload), a 500 if handling it fails unexpectedly"""
+        try:
+            return await self.route(method, target, body)
+        except Exception as error:
+            traceback.print_exc()
+            return 500, {'error': f"Internal error ({type(error).__name__})"}
+
+    async def route(self, method, target, body):
+        """Route one request to its handler; returns (status, payload)"""
+        url = urlsplit(target)
+        path = url.path.rstrip("/")
+        if path == "/metrics":
+            instrumentation = self.hotel.instrumentation
+            if instrumentation is None:
+                return 404, {'error': "Instrumentation is off; start the service with --instrument"}
+            if parse_qs(url.query).get('format') == ["text"]:
+                return 200, instrumentation.export_text()
+            return 200, {'operations': instrumentation.snapshot()}
+        if path == "/rooms":
+            if method != "GET":
+                return 405, {'error': "Use GET"}
+            return 200, [self.room_json(room) for room in self.hotel.get_all_rooms()]
+        if path == "/rooms/available":
+            if method != "GET":
+                return 405, {'error': "Use GET"}
+            return await self.available(parse_qs(url.query))
+        if path.startswith("/rooms/"):
+            if method != "GET":
+                return 405, {'error': "Use GET"}
+            number = path[len("/rooms/"):]
+            room = self.hotel.find_room(int(number)) if number.isdigit() else None
+            if room is None:
+                return 404, {'error': "No such room"}
+            return 200, self.room_json(room)
+        if path in ("/bookings", "/checkouts"):
+            if method != "POST":
+                return 405, {'error': "Use POST"}
+            try:
+                request = json.loads(body)
+                if not isinstance(request, dict):
+                    raise ValueError
+            except ValueError:
+                return 400, {'error': "The body must be a JSON object"}
+            if path == "/bookings":
+                return await self.book(request)
+            return await self.check_out(request)
+        return 404, {'error': "No such endpoint"}
+
+    @staticmethod
+    def room_json(room):
+        """Describe a room as a JSON-ready dict"""
+        return {
+            'room_number': room.room_number,
+            'is_ac': room.is_ac,
+            'is_double_bed': room.is_double_bed,
+            'is_booked': room.is_booked,
+            'customer_name': room.customer_name,
+            'check_in': room.check_in,
+            'check_out': room.check_out,
+            'version': room.version,
+            'stays': [list(stay) for stay in room_stays(room)],
+        }
+
+    async def available(self, query):
+        """GET /rooms/available"""
+        flags = {}
+        for name in ("ac", "double_bed"):
+            value = query.get(name, [""])[0].lower()
+            if value in ("", "any"):
+                flags[name] = None
+            elif value in ("1", "yes", "true"):
+                flags[name] = True
+            elif value in ("0", "no", "false"):
+                flags[name] = False
+            else:
+                return 400, {'error': f"{name} must be yes or no"}
+        check_in = query.get('check_in', [None])[0]
+        check_out = query.get('check_out', [None])[0]
+        if bool(check_in) != bool(check_out):
+            return 400, {'error': "Give both check_in and check_out, or neither"}
+        try:
+            rooms = await self.hotel.get_available_rooms_async(flags['ac'], flags['double_bed'], check_in, check_out)
+        except ValueError:
+            return 400, {'error': f"Dates must be DD/MM/YYYY with check_out 1 to {MAX_STAY_NIGHTS} nights after check_in"}
+        return 200, [self.room_json(room) for room in rooms]
+
+    @staticmethod
+    def valid_version(expected_version):
+        """Return True if a request's expected_version is absent or an integer, as room versions are"""
+        return expected_version is None or (isinstance(expected_version, int) and not isinstance(expected_version, bool))
+
+    @staticmethod
+    def valid_room_number(room_number):
+        """Return True if a request's room_number is an integer; 1.9, "12" and true are not"""
+        return isinstance(room_number, int) and not isinstance(room_number, bool)
+
+    async def book(self, request):
+        """POST /bookings"""
+        try:
+            room_number = request['room_number']
+            customer_name = str(request['customer_name'])
+            check_in = str(request['check_in'])
+            check_out = str(request['check_out'])
+        except KeyError:
+            return 400, {'error': "room_number, customer_name, check_in and check_out are required"}
+        if not self.valid_room_number(room_number):
+            return 400, {'error': "room_number must be an integer"}
+        expected_version = request.get('expected_version')
+        if not self.valid_version(expected_version):
+            return 400, {'error': "expected_version must be an integer"}
+        if not customer_name:
+            return 400, {'error': "customer_name must not be empty"}
+        if not valid_customer_name(customer_name):
+            return 400, {'error': "customer_name must not contain line breaks or other control characters"}
+        try:
+            Reservation.for_booking(customer_name, check_in, check_out)
+        except ValueError:
+            return 400, {'error': f"Dates must be DD/MM/YYYY with check_out 1 to {MAX_STAY_NIGHTS} nights after check_in"}
+        try:
+            booked = await self.hotel.book_room_async(room_number, customer_name, check_in, check_out, expected_version)
+        except RoomVersionConflict as conflict:
+            return 409, {'error': str(conflict), 'version': conflict.version}
+        except (OSError, sqlite3.Error) as error:
+            return 503, {'error': f"The booking was made but could not be saved yet: {error}"}
+        if not booked:
+            if self.hotel.find_room(room_number) is None:
+                return 404, {'error': "No such room"}
+            return 409, {'error': "Room is not free for those dates"}
+        return 201, self.room_json(self.hotel.find_room(room_number))
+
+    async def check_out(self, request):
+        """POST /checkouts"""
+        room_number = request.get('room_number')
+        if not self.valid_room_number(room_number):
+            return 400, {'error': "room_number is required and must be an integer"}
+        expected_version = request.get('expected_version')
+        if not self.valid_version(expected_version):
+            return 400, {'error': "expected_version must be an integer"}
+        try:
+            success, booking_info = await self.hotel.check_out_async(room_number, expected_version)
+        except RoomVersionConflict as conflict:
+            return 409, {'error': str(conflict), 'version': conflict.version}
+        except (OSError, sqlite3.Error) as error:
+            return 503, {'error': f"The checkout was made but could not be saved yet: {error}"}
+        if not success:
+            if self.hotel.find_room(room_number) is None:
+                return 404, {'error': "No such room"}
+            return 409, {'error': "Room is not booked"}
+        return 200, booking_info
+
+
+def main(argv=None):
+    """Run the booking service until interrupted"""
+    parser = argparse.ArgumentParser(description="Hotel Management HTTP/JSON booking service")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    store = parser.add_mutually_exclusive_group()
+    store.add_argument("--csv-file", help="Room data file (default: hotel_rooms.csv next to Hotel Management.py)")
+    store.add_argument("--db", metavar="DB_FILE", help="Keep the rooms in this SQLite database instead")
+    parser.add_argument("--instrument", action="store_true", help="Record latency histograms, served at /metrics")
+
+    args = parser.parse_args(argv)
+
+    storage = SqliteStorage(args.db) if args.db else None
+    hotel = HotelManager(args.csv_file, journal=True, write_behind=True, storage=storage, instrument=args.instrument)
+    print(f"Serving on http://{args.host}:{args.port}")
+    try:
+        asyncio.run(HotelService(hotel).serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        unsaved = hotel.close()
+        if unsaved:
+            print(describe_unsaved(unsaved, hotel.persistence.error), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()